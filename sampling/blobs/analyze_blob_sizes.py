@@ -2,50 +2,148 @@
 #zcat ../sample/b2fSampleU.s.gz \ | awk -F';' 'BEGIN{srand(42)} !seen[$1]++ && rand()<0.001 {print $1}' \ > blob_ids.txt
 
 #!/usr/bin/env python3
+import os
+import sys
+import argparse
 import subprocess
-import base64
+import threading
 import time
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import skew, kurtosis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import pyplot
 
 BLOB_FILE = "blob_ids.txt"   # default input file
+SIZE_MAP_FILE = "blob_sizes.tsv"   # optional blob;size map, checked before asking showCnt
+SHOWCNT_CMD = "~/lookup/showCnt blob 1"
+SIZE_BATCH = 1000   # blob IDs per showCnt request
+READ_CHUNK = 1 << 20
 
-def get_blob_size(blob_id: str):
-    #Fetch blob contents from WoC and return its size in bytes.
-    cmd = f"echo {blob_id.strip()} | ~/lookup/showCnt blob 1"
+def load_size_map(path, wanted):
+    """Sizes for the wanted blobs from a blob;size file, if one exists."""
+    sizes = {}
+    if not os.path.exists(path):
+        return sizes
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            blob, sep, size = line.strip().partition(";")
+            if sep and blob in wanted:
+                try:
+                    sizes[blob] = int(size.split(";", 1)[0])
+                except ValueError:
+                    continue
+    print(f"[INFO] {len(sizes)} blob sizes taken from {path}")
+    return sizes
+
+def _feed(stdin, blob_ids):
+    try:
+        for blob_id in blob_ids:
+            stdin.write(blob_id.encode("utf-8") + b"\n")
+    finally:
+        stdin.close()
+
+def parse_size_stream(stream):
+    """Yield (blob, decoded size) from `blob;base64` lines without keeping the payload.
+
+    Decoded length is 3/4 of the base64 length minus the `=` padding, so each
+    line is only scanned for its newline and its last two characters.
+    """
+    head = b""
+    blob = None
+    n = 0
+    tail = b""
+    while True:
+        chunk = stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        pos = 0
+        while pos < len(chunk):
+            if blob is None:
+                semi = chunk.find(b";", pos)
+                nl = chunk.find(b"\n", pos)
+                if nl != -1 and (semi == -1 or nl < semi):
+                    head = b""  # "no blob ..." or other line without payload
+                    pos = nl + 1
+                    continue
+                if semi == -1:
+                    head += chunk[pos:]
+                    break
+                blob = (head + chunk[pos:semi]).decode("utf-8", errors="ignore")
+                head = b""
+                n = 0
+                tail = b""
+                pos = semi + 1
+            else:
+                nl = chunk.find(b"\n", pos)
+                end = len(chunk) if nl == -1 else nl
+                seg = chunk[pos:end].rstrip(b"\r") if nl != -1 else chunk[pos:end]
+                n += len(seg)
+                tail = seg[-2:] if len(seg) >= 2 else (tail + seg)[-2:]
+                if nl == -1:
+                    break
+                if not blob.startswith("no blob"):
+                    yield blob, n * 3 // 4 - tail.count(b"=")
+                blob = None
+                pos = nl + 1
+    if blob is not None and not blob.startswith("no blob"):
+        yield blob, n * 3 // 4 - tail.count(b"=")
+
+def fetch_blob_sizes(blob_ids):
+    """One showCnt request for a batch of blob IDs; yields (blob, size) as they stream in."""
+    proc = subprocess.Popen(SHOWCNT_CMD, shell=True, stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE)
+    feeder = threading.Thread(target=_feed, args=(proc.stdin, blob_ids), daemon=True)
+    feeder.start()
     try:
-        output = subprocess.check_output(cmd, shell=True, text=True).strip()
-        if ";" not in output or output.startswith("no blob"):
-            return None 
-        b64 = output.split(";", 1)[1]
-        return len(base64.b64decode(b64))
-    except Exception as e:
-        print(f"[WARN] Failed to get blob {blob_id}: {e}")
-        return None
-
-def main():
+        yield from parse_size_stream(proc.stdout)
+    finally:
+        proc.stdout.close()
+        feeder.join()
+        proc.wait()
+
+def iter_blob_sizes(blob_ids, size_map_path=SIZE_MAP_FILE, batch=SIZE_BATCH):
+    """Sizes for every blob that exists: size map first, then batched showCnt."""
+    known = load_size_map(size_map_path, set(blob_ids))
+    for blob_id in blob_ids:
+        if blob_id in known:
+            yield blob_id, known[blob_id]
+    todo = [b for b in blob_ids if b not in known]
+    for i in range(0, len(todo), batch):
+        try:
+            yield from fetch_blob_sizes(todo[i:i + batch])
+        except Exception as e:
+            print(f"[WARN] Failed to get blobs {i}-{i + batch}: {e}")
+
+def get_blob_size(blob_id: str):
+    #Fetch blob size in bytes from WoC without decoding its contents.
+    for _, size in fetch_blob_sizes([blob_id.strip()]):
+        return size
+    return None
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Blob size distribution over sampled blob IDs.")
+    ap.add_argument("blob_file", nargs="?", default=BLOB_FILE)
+    args = ap.parse_args(argv)
+
     blob_sizes = []
     skipped = 0
     start = time.time()
 
-    with open(BLOB_FILE, "r") as f:
-        for idx, line in enumerate(f, 1):
-            blob_id = line.strip()
-            size = get_blob_size(blob_id)
-
-            if size is None:
-                skipped += 1
-                continue
+    with open(args.blob_file, "r") as f:
+        blob_ids = [line.strip() for line in f if line.strip()]
 
-            blob_sizes.append(size)
+    for _, size in iter_blob_sizes(blob_ids):
+        blob_sizes.append(size)
 
-            if len(blob_sizes) % 100 == 0:
-                elapsed = time.time() - start
-                avg = np.mean(blob_sizes)
-                print(f"[INFO] Processed {len(blob_sizes)} valid blobs "
-                      f"(line {idx}) in {elapsed:.1f}s | Current mean size: {avg:.2f} bytes")
+        if len(blob_sizes) % 100 == 0:
+            elapsed = time.time() - start
+            avg = np.mean(blob_sizes)
+            print(f"[INFO] Processed {len(blob_sizes)} valid blobs "
+                  f"(of {len(blob_ids)}) in {elapsed:.1f}s | Current mean size: {avg:.2f} bytes")
+    skipped = len(blob_ids) - len(blob_sizes)
 
+    from scipy.stats import skew, kurtosis
+    plt = pyplot()
     blob_sizes = np.array(blob_sizes)
     n = len(blob_sizes)
     print("\n===== RESULTS =====")
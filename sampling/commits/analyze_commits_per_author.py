@@ -1,88 +1,44 @@
 #First run the following in terminal to find a list of authors that can be looked up directly for a2c:
-# zcat ../A2cSampleU.s.gz | cut -d';' -f1 | sort -u > authors_u.txt
+# PYTHONPATH=../.. python -m woclib.extsort -f 1 -o authors_u.txt ../A2cSampleU.s.gz
+# (same result as: zcat ../A2cSampleU.s.gz | cut -d';' -f1 | LC_ALL=C sort -u > authors_u.txt)
 # cat authors_u.txt | ~/lookup/getValues -f a2c > author_commits.tsv
 
+# For a year-stratified sample, draw authors from c2dat instead and keep their weights:
+# PYTHONPATH=../.. python -m woclib.stratified -t 2 --reservoir 20000 --key-field 4 -o ../c2datStratU.s.gz ../c2datSampleU.s.gz
+# cut -d';' -f1 ../c2datStratU.s.gz.key_weights.tsv > authors_u.txt; mv ../c2datStratU.s.gz.key_weights.tsv author_weights.tsv
+# (stats and CIs are then weighted by author_weights.tsv whenever it is present)
 
 #!/usr/bin/env python3
 import os
+import sys
+import argparse
 import subprocess
-from collections import defaultdict
+from itertools import compress
 
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import skew, kurtosis
 
-HOME = os.path.expanduser("~")
-LOOKUP_CMD = ["~/lookup/getValues", "-f", "a2c"]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import (log, pyplot, safe_savefig, batched, compute_and_save_stats,
+                           compute_and_save_ci, memoized, read_sampled_keys, sha1_mask,
+                           shared_store)
+from woclib.sequential import SequentialEstimator, shuffled_batches
+from woclib.stratified import align_weights, read_key_weights
+from woclib.shaid import group_handles
 
-def log(msg):
-    print(f"[INFO] {msg}", flush=True)
-
-def safe_savefig(path):
-    out = os.path.join(HOME, path)
-    plt.savefig(out, bbox_inches="tight")
-    print(f"[SAVED] {out}")
-    plt.close()
-
-def compute_and_save_stats(values, label, outfile):
-    values = np.asarray(values, dtype=float)
-    stats = {}
-    if values.size == 0:
-        stats = {
-            "count": 0, "mean": 0, "median": 0, "std": 0, "var": 0,
-            "skew": 0, "kurtosis": 0, "q1": 0, "q2": 0, "q3": 0
-        }
-    else:
-        stats = {
-            "count": int(values.size),
-            "mean": float(np.mean(values)),
-            "median": float(np.median(values)),
-            "std": float(np.std(values, ddof=1)) if values.size > 1 else 0.0,
-            "var": float(np.var(values, ddof=1)) if values.size > 1 else 0.0,
-            "skew": float(skew(values, bias=False)) if values.size > 1 else 0.0,
-            "kurtosis": float(kurtosis(values, bias=False)) if values.size > 1 else 0.0,
-            "q1": float(np.percentile(values, 25)),
-            "q2": float(np.percentile(values, 50)),
-            "q3": float(np.percentile(values, 75)),
-        }
-    outpath = os.path.join(HOME, outfile)
-    with open(outpath, "w") as f:
-        for k, v in stats.items():
-            f.write(f"{k}: {v}\n")
-    log(f"{label} stats written to {outpath}")
-    return stats
-
-def read_sampled_authors(tsv_path, step):
-    """Deterministically sample every 1/step author from the TSV's first column."""
-    seen = set()
-    sampled = []
-    with open(tsv_path, "r", errors="ignore") as f:
-        for idx, line in enumerate(f):
-            if idx % step != 0:
-                continue
-            parts = line.strip().split(";")
-            if not parts:
-                continue
-            author = parts[0]
-            if author and author not in seen:
-                seen.add(author)
-                sampled.append(author)
-    log(f"From {tsv_path}: sampled {len(sampled)} unique authors (every 1/{step} rows).")
-    return sampled
-
-def batched(iterable, n):
-    buf = []
-    for x in iterable:
-        buf.append(x)
-        if len(buf) >= n:
-            yield buf
-            buf = []
-    if buf:
-        yield buf
-
-def lookup_commits_for_authors(authors):
-    """Use lookup a2c to get all commits for each author."""
-    a2c_map = defaultdict(list)
+LOOKUP_CMD = ["~/lookup/getValues", "-f", "a2c"]
+BOOTSTRAP_REPS = 2000
+BOOTSTRAP_WORKERS = 0  # >1 spreads replicates over a process pool
+BOOTSTRAP_ALPHA = 0.05
+SAMPLE_STEP = 100  # every 1/SAMPLE_STEP rows of author_commits.tsv in the fixed-size mode
+ADAPTIVE_BATCH = 2000  # authors looked up per round in --adaptive mode
+ADAPTIVE_PRECISION = 0.02  # relative 95% CI half-width of mean and median
+AUTHOR_WEIGHTS_FILE = "author_weights.tsv"
+
+@memoized
+def lookup_commits_for_authors(authors, store):
+    """Use lookup a2c to get all commits for each author, as interned commit handles."""
+    author_index = {}
+    owners, handles = [], []
     total = len(authors)
     processed = 0
     for batch in batched(authors, 2000):
@@ -94,16 +50,42 @@ def lookup_commits_for_authors(authors):
             stdout=subprocess.PIPE,
         )
         out, _ = proc.communicate("\n".join(batch))
+        batch_owners, batch_commits = [], []
         for line in out.strip().splitlines():
             parts = line.split(";")
             if len(parts) >= 2:
                 author, commit = parts[0], parts[1]
-                a2c_map[author].append(commit)
+                batch_owners.append(author_index.setdefault(author, len(author_index)))
+                batch_commits.append(commit)
+        ok = sha1_mask(batch_commits, "commit ids")
+        owners.append(np.array(batch_owners, dtype=np.int64)[ok])
+        handles.append(store.intern_many(list(compress(batch_commits, ok))))
         processed += len(batch)
         log(f"lookup a2c: processed {processed}/{total} authors...")
-    return a2c_map
+    if not author_index:
+        return {}
+    names = list(author_index)
+    grouped = group_handles(np.concatenate(owners), np.concatenate(handles))
+    return {names[i]: h for i, h in grouped.items()}
+
+def lookup_commits_for_authors_adaptive(authors, store, precision, batch_size=ADAPTIVE_BATCH, by_author=None):
+    """Look up authors in random batches until the mean and median commits per
+    author reach `precision`; returns the merged map and the estimator."""
+    estimator = SequentialEstimator(("mean", "median"), precision=precision)
+    merged = {}
+    for batch in shuffled_batches(authors, batch_size):
+        found = lookup_commits_for_authors(batch, store)
+        merged.update(found)
+        counted = [(a, len(v)) for a, v in found.items() if len(v)]
+        estimator.add([n for _, n in counted], align_weights(by_author, [a for a, _ in counted]))
+        log(f"Adaptive: {estimator.describe()}")
+        if estimator.converged():
+            log(f"Target precision {precision} reached after {len(merged)} authors.")
+            break
+    return merged, estimator
 
 def make_boxplot(values, stem):
+    plt = pyplot()
     plt.figure(figsize=(8,6))
     plt.boxplot(values, vert=True, showfliers=False, labels=["Commits per Author"])
     plt.title("Commits per Author (Linear)")
@@ -111,6 +93,7 @@ def make_boxplot(values, stem):
     safe_savefig(f"{stem}_box_linear.png")
 
 def make_cdf(values, stem):
+    plt = pyplot()
     sorted_vals = np.sort(values)
     y = np.arange(1, len(sorted_vals)+1) / len(sorted_vals)
 
@@ -122,23 +105,41 @@ def make_cdf(values, stem):
     plt.ylabel("Cumulative Probability")
     safe_savefig(f"{stem}_cdf_logx.png")
 
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Commits per Author over sampled authors.")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="look up authors in random batches until --precision is reached instead of every 1/SAMPLE_STEP")
+    ap.add_argument("--precision", type=float, default=ADAPTIVE_PRECISION)
+    ap.add_argument("--batch", type=int, default=ADAPTIVE_BATCH)
+    args = ap.parse_args(argv)
 
-    authors = read_sampled_authors("author_commits.tsv", 100)
+    authors = read_sampled_keys("author_commits.tsv", 1 if args.adaptive else SAMPLE_STEP, "authors")
     if not authors:
         log("No sampled authors found. Exiting.")
         return
 
-    a2c_map = lookup_commits_for_authors(authors)
-    counts = [len(v) for v in a2c_map.values() if v]
+    commit_ids = shared_store("commits")
+    by_author = read_key_weights(AUTHOR_WEIGHTS_FILE)
+    precision = None
+    if args.adaptive:
+        a2c_map, estimator = lookup_commits_for_authors_adaptive(
+            authors, commit_ids, args.precision, args.batch, by_author=by_author)
+        precision = estimator.summary()
+    else:
+        a2c_map = lookup_commits_for_authors(authors, commit_ids)
+    counted = [(a, len(v)) for a, v in a2c_map.items() if len(v)]
+    counts = [c for _, c in counted]
+    weights = align_weights(by_author, [a for a, _ in counted])
     log(f"Authors with commits: {len(counts)} / sampled {len(authors)}")
 
     if not counts:
         log("No commits found for sampled authors. Try a different step or input.")
         return
 
-    compute_and_save_stats(counts, "Commits per Author",
-                           "overlap_commits_per_author_stats.txt")
+    stats = compute_and_save_stats(counts, "Commits per Author",
+                                   "overlap_commits_per_author_stats.txt", weights, precision)
+    compute_and_save_ci(counts, stats, "Commits per Author", "overlap_commits_per_author_ci.txt",
+                        BOOTSTRAP_REPS, BOOTSTRAP_ALPHA, BOOTSTRAP_WORKERS, weights)
     make_boxplot(counts, "overlap_commits_per_author")
     make_cdf(counts, "overlap_commits_per_author")
     log("Done.")
@@ -1,87 +1,41 @@
 #First run the following in terminal to find a list of projects that can be looked up directly for p2c:
-# zcat ../c2PSampleU.s.gz | cut -d';' -f2 | sort -u > projects_u.txt
+# PYTHONPATH=../.. python -m woclib.extsort -f 2 -o projects_u.txt ../c2PSampleU.s.gz
+# (same result as: zcat ../c2PSampleU.s.gz | cut -d';' -f2 | LC_ALL=C sort -u > projects_u.txt)
 # cat projects_u.txt | ~/lookup/getValues -f p2c > project_commits.tsv
 
 #!/usr/bin/env python3
 import os
+import sys
+import argparse
 import subprocess
-from collections import defaultdict
+from itertools import compress
 
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import skew, kurtosis
 
-HOME = os.path.expanduser("~")
-LOOKUP_CMD = ["~/lookup/getValues", "-f", "p2c"]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import (log, pyplot, safe_savefig, batched, compute_and_save_stats,
+                           compute_and_save_ci, memoized, read_sampled_keys, sha1_mask,
+                           shared_store)
+from woclib.bitmaps import BitmapIndex, write_overlap_report
+from woclib.sequential import SequentialEstimator, shuffled_batches
+from woclib.shaid import group_handles
 
-def log(msg):
-    print(f"[INFO] {msg}", flush=True)
-
-def safe_savefig(path):
-    out = os.path.join(HOME, path)
-    plt.savefig(out, bbox_inches="tight")
-    print(f"[SAVED] {out}")
-    plt.close()
-
-def compute_and_save_stats(values, label, outfile):
-    values = np.asarray(values, dtype=float)
-    stats = {}
-    if values.size == 0:
-        stats = {
-            "count": 0, "mean": 0, "median": 0, "std": 0, "var": 0,
-            "skew": 0, "kurtosis": 0, "q1": 0, "q2": 0, "q3": 0
-        }
-    else:
-        stats = {
-            "count": int(values.size),
-            "mean": float(np.mean(values)),
-            "median": float(np.median(values)),
-            "std": float(np.std(values, ddof=1)) if values.size > 1 else 0.0,
-            "var": float(np.var(values, ddof=1)) if values.size > 1 else 0.0,
-            "skew": float(skew(values, bias=False)) if values.size > 1 else 0.0,
-            "kurtosis": float(kurtosis(values, bias=False)) if values.size > 1 else 0.0,
-            "q1": float(np.percentile(values, 25)),
-            "q2": float(np.percentile(values, 50)),
-            "q3": float(np.percentile(values, 75)),
-        }
-    outpath = os.path.join(HOME, outfile)
-    with open(outpath, "w") as f:
-        for k, v in stats.items():
-            f.write(f"{k}: {v}\n")
-    log(f"{label} stats written to {outpath}")
-    return stats
-
-def read_sampled_projects(tsv_path, step):
-    """Deterministically sample every 1/step project from the TSV's first column."""
-    seen = set()
-    sampled = []
-    with open(tsv_path, "r", errors="ignore") as f:
-        for idx, line in enumerate(f):
-            if idx % step != 0:
-                continue
-            parts = line.strip().split(";")
-            if not parts:
-                continue
-            proj = parts[0]
-            if proj and proj not in seen:
-                seen.add(proj)
-                sampled.append(proj)
-    log(f"From {tsv_path}: sampled {len(sampled)} unique projects (every 1/{step} rows).")
-    return sampled
-
-def batched(iterable, n):
-    buf = []
-    for x in iterable:
-        buf.append(x)
-        if len(buf) >= n:
-            yield buf
-            buf = []
-    if buf:
-        yield buf
-
-def lookup_commits_for_projects(projects):
-    """Use lookup (V) p2c to get all commits for each project."""
-    proj_to_commits = defaultdict(list)
+LOOKUP_CMD = ["~/lookup/getValues", "-f", "p2c"]
+BOOTSTRAP_REPS = 2000
+BOOTSTRAP_WORKERS = 0  # >1 spreads replicates over a process pool
+BOOTSTRAP_ALPHA = 0.05
+SAMPLE_STEP = 100  # every 1/SAMPLE_STEP rows of project_commits.tsv in the fixed-size mode
+ADAPTIVE_BATCH = 2000  # projects looked up per round in --adaptive mode
+ADAPTIVE_PRECISION = 0.02  # relative 95% CI half-width of mean and median
+OVERLAP_TOP_PAIRS = 1000  # most-shared project pairs written to the pairs file
+FORK_CONTAINMENT = 0.5  # share of the smaller project's commits that makes a pair fork-like
+OVERLAP_MAX_DEGREE = 1000  # commits in more sampled projects than this are left out of the pair counts
+
+@memoized
+def lookup_commits_for_projects(projects, store):
+    """Use lookup (V) p2c to get all commits for each project, as interned commit handles."""
+    proj_index = {}
+    owners, handles = [], []
     total = len(projects)
     processed = 0
     for batch in batched(projects, 2000):
@@ -93,16 +47,41 @@ def lookup_commits_for_projects(projects):
             stdout=subprocess.PIPE,
         )
         out, _ = proc.communicate("\n".join(batch))
+        batch_owners, batch_commits = [], []
         for line in out.strip().splitlines():
             parts = line.split(";")
             if len(parts) >= 2:
                 proj, commit = parts[0], parts[1]
-                proj_to_commits[proj].append(commit)
+                batch_owners.append(proj_index.setdefault(proj, len(proj_index)))
+                batch_commits.append(commit)
+        ok = sha1_mask(batch_commits, "commit ids")
+        owners.append(np.array(batch_owners, dtype=np.int64)[ok])
+        handles.append(store.intern_many(list(compress(batch_commits, ok))))
         processed += len(batch)
         log(f"lookup p2c: processed {processed}/{total} projects...")
-    return proj_to_commits
+    if not proj_index:
+        return {}
+    names = list(proj_index)
+    grouped = group_handles(np.concatenate(owners), np.concatenate(handles))
+    return {names[i]: h for i, h in grouped.items()}
+
+def lookup_commits_for_projects_adaptive(projects, store, precision, batch_size=ADAPTIVE_BATCH):
+    """Look up projects in random batches until the mean and median commits per
+    project reach `precision`; returns the merged map and the estimator."""
+    estimator = SequentialEstimator(("mean", "median"), precision=precision)
+    merged = {}
+    for batch in shuffled_batches(projects, batch_size):
+        found = lookup_commits_for_projects(batch, store)
+        merged.update(found)
+        estimator.add([len(v) for v in found.values() if len(v)])
+        log(f"Adaptive: {estimator.describe()}")
+        if estimator.converged():
+            log(f"Target precision {precision} reached after {len(merged)} projects.")
+            break
+    return merged, estimator
 
 def make_boxplot(values, stem):
+    plt = pyplot()
     plt.figure(figsize=(8,6))
     plt.boxplot(values, vert=True, showfliers=False, labels=["Commits per Project"])
     plt.title("Commits per Project (Linear)")
@@ -110,6 +89,7 @@ def make_boxplot(values, stem):
     safe_savefig(f"{stem}_box_linear.png")
 
 def make_cdf(values, stem):
+    plt = pyplot()
     sorted_vals = np.sort(values)
     y = np.arange(1, len(sorted_vals)+1) / len(sorted_vals)
 
@@ -121,26 +101,49 @@ def make_cdf(values, stem):
     plt.ylabel("Cumulative Probability")
     safe_savefig(f"{stem}_cdf_logx.png")
 
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Commits per Project over sampled projects.")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="look up projects in random batches until --precision is reached instead of every 1/SAMPLE_STEP")
+    ap.add_argument("--precision", type=float, default=ADAPTIVE_PRECISION)
+    ap.add_argument("--batch", type=int, default=ADAPTIVE_BATCH)
+    args = ap.parse_args(argv)
 
-    projects = read_sampled_projects("project_commits.tsv", 100)
+    projects = read_sampled_keys("project_commits.tsv", 1 if args.adaptive else SAMPLE_STEP, "projects")
     if not projects:
         log("No sampled projects found. Exiting.")
         return
 
-    proj_to_commits = lookup_commits_for_projects(projects)
+    commit_ids = shared_store("commits")
+    precision = None
+    if args.adaptive:
+        proj_to_commits, estimator = lookup_commits_for_projects_adaptive(
+            projects, commit_ids, args.precision, args.batch)
+        precision = estimator.summary()
+    else:
+        proj_to_commits = lookup_commits_for_projects(projects, commit_ids)
     # Keep only projects that returned commits
-    counts = [len(v) for v in proj_to_commits.values() if v]
+    counts = [len(v) for v in proj_to_commits.values() if len(v)]
     log(f"Projects with commits: {len(counts)} / sampled {len(projects)}")
 
     if not counts:
         log("No commits found for sampled projects. Try a different step or input.")
         return
 
-    compute_and_save_stats(counts, "Commits per Project",
-                           "overlap_commits_per_project_stats.txt")
+    stats = compute_and_save_stats(counts, "Commits per Project",
+                                   "overlap_commits_per_project_stats.txt", extra=precision)
+    compute_and_save_ci(counts, stats, "Commits per Project", "overlap_commits_per_project_ci.txt",
+                        BOOTSTRAP_REPS, BOOTSTRAP_ALPHA, BOOTSTRAP_WORKERS)
     make_boxplot(counts, "overlap_commits_per_project")
     make_cdf(counts, "overlap_commits_per_project")
+
+    # Commit sharing between sampled projects, on compressed bitmaps of commit handles
+    index = BitmapIndex()
+    for proj, handles in proj_to_commits.items():
+        if len(handles):
+            index.add(proj, handles)
+    write_overlap_report(index, "Commit overlap between projects", "overlap_commits_per_project",
+                         OVERLAP_TOP_PAIRS, FORK_CONTAINMENT, OVERLAP_MAX_DEGREE)
     log("Done.")
 
 if __name__ == "__main__":
@@ -1,86 +1,46 @@
 #First run the following in terminal to find a list of authors that can be looked up directly for a2p:
-# zcat ../A2cSampleU.s.gz | cut -d';' -f1 | sort -u > authors_u.txt
+# PYTHONPATH=../.. python -m woclib.extsort -f 1 -o authors_u.txt ../A2cSampleU.s.gz
+# (same result as: zcat ../A2cSampleU.s.gz | cut -d';' -f1 | LC_ALL=C sort -u > authors_u.txt)
 # cat projects_u.txt | ~/lookup/getValues -f a2c > author_commits.tsv
+# For a year-stratified sample, draw authors from c2dat instead and keep their weights:
+# PYTHONPATH=../.. python -m woclib.stratified -t 2 --reservoir 20000 --key-field 4 -o ../c2datStratU.s.gz ../c2datSampleU.s.gz
+# cut -d';' -f1 ../c2datStratU.s.gz.key_weights.tsv > authors_u.txt; mv ../c2datStratU.s.gz.key_weights.tsv author_weights.tsv
+# (stats and CIs are then weighted by author_weights.tsv whenever it is present)
 
 #!/usr/bin/env python3
 import os
 import sys
+import argparse
 import subprocess
-from collections import defaultdict
 
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import skew, kurtosis
 
-HOME = os.path.expanduser("~")
-LOOKUP_CMD = ["~/lookup/getValues", "-f", "a2p"]
-
-def log(msg):
-    print(f"[INFO] {msg}", flush=True)
-
-def safe_savefig(path):
-    out = os.path.join(HOME, path)
-    plt.savefig(out, bbox_inches="tight")
-    print(f"[SAVED] {out}")
-    plt.close()
-
-def compute_and_save_stats(values, label, outfile):
-    values = np.asarray(values, dtype=float)
-    stats = {}
-    if values.size == 0:
-        stats = {
-            "count": 0, "mean": 0, "median": 0, "std": 0, "var": 0,
-            "skew": 0, "kurtosis": 0, "q1": 0, "q2": 0, "q3": 0
-        }
-    else:
-        stats = {
-            "count": int(values.size),
-            "mean": float(np.mean(values)),
-            "median": float(np.median(values)),
-            "std": float(np.std(values, ddof=1)) if values.size > 1 else 0.0,
-            "var": float(np.var(values, ddof=1)) if values.size > 1 else 0.0,
-            "skew": float(skew(values, bias=False)) if values.size > 1 else 0.0,
-            "kurtosis": float(kurtosis(values, bias=False)) if values.size > 1 else 0.0,
-            "q1": float(np.percentile(values, 25)),
-            "q2": float(np.percentile(values, 50)),
-            "q3": float(np.percentile(values, 75)),
-        }
-    outpath = os.path.join(HOME, outfile)
-    with open(outpath, "w") as f:
-        for k, v in stats.items():
-            f.write(f"{k}: {v}\n")
-    log(f"{label} stats written to {outpath}")
-    return stats
-
-def read_sampled_authors(tsv_path, step):
-    seen = set()
-    sampled = []
-    with open(tsv_path, "r", errors="ignore") as f:
-        for idx, line in enumerate(f):
-            if idx % step != 0:
-                continue
-            parts = line.strip().split(";")
-            if not parts:
-                continue
-            author = parts[0]
-            if author and author not in seen:
-                seen.add(author)
-                sampled.append(author)
-    log(f"From {tsv_path}: sampled {len(sampled)} unique authors (every 1/{step} rows).")
-    return sampled
-
-def batched(iterable, n):
-    buf = []
-    for x in iterable:
-        buf.append(x)
-        if len(buf) >= n:
-            yield buf
-            buf = []
-    if buf:
-        yield buf
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import (log, pyplot, safe_savefig, batched, compute_and_save_stats,
+                           compute_and_save_ci, memoized, read_sampled_keys)
+from woclib.bipartite import Bipartite, write_graph_report
+from woclib.bitmaps import BitmapIndex, write_overlap_report
+from woclib.sequential import SequentialEstimator, shuffled_batches
+from woclib.stratified import align_weights, read_key_weights
 
+LOOKUP_CMD = ["~/lookup/getValues", "-f", "a2p"]
+BOOTSTRAP_REPS = 2000
+BOOTSTRAP_WORKERS = 0  # >1 spreads replicates over a process pool
+BOOTSTRAP_ALPHA = 0.05
+SAMPLE_STEP = 100  # every 1/SAMPLE_STEP rows of author_commits.tsv in the fixed-size mode
+ADAPTIVE_BATCH = 2000  # authors looked up per round in --adaptive mode
+ADAPTIVE_PRECISION = 0.02  # relative 95% CI half-width of mean and median
+AUTHOR_WEIGHTS_FILE = "author_weights.tsv"
+OVERLAP_TOP_PAIRS = 1000  # project pairs with the most shared sampled authors
+FORK_CONTAINMENT = 0.5  # share of the smaller project's authors that makes a pair fork-like
+OVERLAP_MAX_DEGREE = 1000  # authors in more projects than this are left out of the pair counts
+PROJECTION_MAX_DEGREE = 1000  # projects with more sampled authors are left out of the co-author projection
+
+@memoized
 def lookup_projects_for_authors(authors):
-    a2p_map = defaultdict(set)
+    """Use lookup a2p to get the projects of each author, as a CSR author-project graph."""
+    author_index, project_index = {}, {}
+    left, right = [], []
     total = len(authors)
     processed = 0
     for batch in batched(authors, 2000):
@@ -96,12 +56,40 @@ def lookup_projects_for_authors(authors):
             parts = line.split(";")
             if len(parts) >= 2:
                 author, project = parts[0], parts[1]
-                a2p_map[author].add(project)
+                left.append(author_index.setdefault(author, len(author_index)))
+                right.append(project_index.setdefault(project, len(project_index)))
         processed += len(batch)
         log(f"lookup a2p: processed {processed}/{total} authors...")
-    return a2p_map
+    return Bipartite.from_edges(np.array(left, dtype=np.int64), np.array(right, dtype=np.int64),
+                                list(author_index), list(project_index))
+
+def lookup_projects_for_authors_adaptive(authors, precision, batch_size=ADAPTIVE_BATCH, by_author=None):
+    """Look up authors in random batches until the mean and median projects per
+    author reach `precision`; returns the merged graph and the estimator."""
+    estimator = SequentialEstimator(("mean", "median"), precision=precision)
+    found = []
+    seen = 0
+    for batch in shuffled_batches(authors, batch_size):
+        graph = lookup_projects_for_authors(batch)
+        found.append(graph)
+        seen += graph.n_left
+        estimator.add(graph.left_degrees(), align_weights(by_author, graph.left_names))
+        log(f"Adaptive: {estimator.describe()}")
+        if estimator.converged():
+            log(f"Target precision {precision} reached after {seen} authors.")
+            break
+    return Bipartite.concat(found), estimator
+
+def shared_author_index(graph):
+    """Author membership per project as compressed bitmaps over author indices."""
+    p2a = graph.transpose()
+    index = BitmapIndex()
+    for j, project in enumerate(p2a.left_names):
+        index.add(project, p2a.neighbors(j))
+    return index
 
 def make_boxplot(values, stem):
+    plt = pyplot()
     plt.figure(figsize=(8,6))
     plt.boxplot(values, vert=True, showfliers=False, labels=["Projects per Author"])
     plt.title("Projects per Author (Linear)")
@@ -109,6 +97,7 @@ def make_boxplot(values, stem):
     safe_savefig(f"{stem}_box_linear.png")
 
 def make_cdf(values, stem):
+    plt = pyplot()
     sorted_vals = np.sort(values)
     y = np.arange(1, len(sorted_vals)+1) / len(sorted_vals)
 
@@ -120,25 +109,47 @@ def make_cdf(values, stem):
     plt.ylabel("Cumulative Probability")
     safe_savefig(f"{stem}_cdf_logx.png")
 
-def main():
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Projects per Author over sampled authors.")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="look up authors in random batches until --precision is reached instead of every 1/SAMPLE_STEP")
+    ap.add_argument("--precision", type=float, default=ADAPTIVE_PRECISION)
+    ap.add_argument("--batch", type=int, default=ADAPTIVE_BATCH)
+    args = ap.parse_args(argv)
 
-    authors = read_sampled_authors("author_commits.tsv", 100)
+    authors = read_sampled_keys("author_commits.tsv", 1 if args.adaptive else SAMPLE_STEP, "authors")
     if not authors:
         log("No sampled authors found. Exiting.")
         return
 
-    a2p_map = lookup_projects_for_authors(authors)
-    counts = [len(v) for v in a2p_map.values() if v]
+    by_author = read_key_weights(AUTHOR_WEIGHTS_FILE)
+    precision = None
+    if args.adaptive:
+        a2p, estimator = lookup_projects_for_authors_adaptive(
+            authors, args.precision, args.batch, by_author=by_author)
+        precision = estimator.summary()
+    else:
+        a2p = lookup_projects_for_authors(authors)
+    counts = a2p.left_degrees()
+    weights = align_weights(by_author, a2p.left_names)
     log(f"Authors with projects: {len(counts)} / sampled {len(authors)}")
 
-    if not counts:
+    if not len(counts):
         log("No projects found for sampled authors. Try a different step or input.")
         return
 
-    compute_and_save_stats(counts, "Projects per Author",
-                           "overlap_projects_per_author_stats.txt")
+    stats = compute_and_save_stats(counts, "Projects per Author",
+                                   "overlap_projects_per_author_stats.txt", weights, precision)
+    compute_and_save_ci(counts, stats, "Projects per Author", "overlap_projects_per_author_ci.txt",
+                        BOOTSTRAP_REPS, BOOTSTRAP_ALPHA, BOOTSTRAP_WORKERS, weights)
     make_boxplot(counts, "overlap_projects_per_author")
     make_cdf(counts, "overlap_projects_per_author")
+
+    write_graph_report(a2p, "Authors per Project (sampled authors)", "overlap_projects_per_author",
+                       PROJECTION_MAX_DEGREE)
+    write_overlap_report(shared_author_index(a2p), "Shared authors between projects",
+                         "overlap_projects_shared_authors", OVERLAP_TOP_PAIRS,
+                         FORK_CONTAINMENT, OVERLAP_MAX_DEGREE)
     log("Done.")
 
 if __name__ == "__main__":
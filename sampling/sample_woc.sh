@@ -24,6 +24,22 @@ sample_relation(){
   log "<<< Finished $rel"
 }
 
+# Year-stratified c2dat sample: a fixed reservoir of commits per year plus
+# per-year weights (c2datStratU.s.gz.weights.tsv) for the over-time and
+# per-author analyses. Enable with STRATA_RESERVOIR=<rows per year>.
+sample_stratified(){
+  rel=$1
+  out="$OUTDIR/${rel}StratU.s.gz"
+  log ">>> Stratified sampling $rel → $out"
+  zcat /da?_data/basemaps/gz/${rel}FullU*.s \
+    | PYTHONPATH="$(dirname "$(readlink -f "$0")")/.." python3 -m woclib.stratified \
+        -t 2 --reservoir "$STRATA_RESERVOIR" --key-field 4 -o "$out"
+  log "<<< Finished $rel"
+}
+
 sample_relation c2dat
+if [[ -n "${STRATA_RESERVOIR:-}" ]]; then
+  sample_stratified c2dat
+fi
 sample_relation c2P
 sample_relation A2c
\ No newline at end of file
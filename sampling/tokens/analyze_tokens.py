@@ -3,30 +3,46 @@
 
 #!/usr/bin/env python3
 import os
-import re
-import random
+import sys
+import argparse
 import subprocess
+from itertools import compress
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import skew, kurtosis
-from scipy.optimize import curve_fit
 
-HOME = os.path.expanduser("~")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import (HOME, log, pyplot, safe_savefig, compute_and_save_stats, memoized,
+                           sha1_mask, shared_store)
+from woclib.tokenfreq import TokenFrequency, fit_zipf, tokenize
+from woclib.minhash import LSHIndex, write_cluster_report
+from woclib.sequential import SequentialEstimator, shuffled_batches
+
 SAMPLE_SIZE = 10000 #not all 10,000 will be found. Actual sampled amount shown in output
 TOTAL_BLOBS = 12490439543 #From WoC website
+RANK_TABLE_SIZE = 10000 #heaviest tokens kept by the bounded-memory frequency table
+ZIPF_MIN_COUNT = 5 #ranks rarer than this are left out of the Zipf fit
+ADAPTIVE_BATCH = 500 #blobs per batch in --adaptive mode
+ADAPTIVE_PRECISION = 0.02 #stop once mean/median tokens per blob and Heaps beta are this tight
+HEAPS_RESAMPLES = 100 #random half-samples of the blobs refitted to estimate the spread of Heaps beta
+HEAPS_SE_GROWTH = 1.5 #adaptive mode re-estimates that spread once the sample has grown by this factor
 
-def log(msg):
-    print(f"[INFO] {msg}", flush=True)
-
-def safe_savefig(name):
-    out = os.path.join(HOME, name)
-    plt.savefig(out, bbox_inches="tight")
-    log(f"[SAVED] {out}")
-    plt.close()
-
-def tokenize(text):
-    tokens = re.split(r"\W+", text)
-    return [t for t in tokens if t]
+@memoized
+def load_blob_ids(path, store, chunk=1_000_000):
+    """Intern the blob IDs listed one per line (malformed ones are logged and
+    skipped); returns their handles."""
+    handles = []
+    buf = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            buf.append(line)
+            if len(buf) >= chunk:
+                handles.append(store.intern_many(list(compress(buf, sha1_mask(buf, "blob ids")))))
+                buf = []
+    if buf:
+        handles.append(store.intern_many(list(compress(buf, sha1_mask(buf, "blob ids")))))
+    return np.concatenate(handles) if handles else np.zeros(0, dtype=np.int64)
 
 def get_blob_content(blob_id):
     """Fetch blob content using showCnt (handle binary safely)."""
@@ -48,68 +64,147 @@ def get_blob_content(blob_id):
 def heaps_law(N, K, beta):
     return K * (N ** beta)
 
-def fit_heaps(growth_points):
+def _fit_heaps(growth_points):
     pts = [(x, y) for x, y in growth_points if x > 0 and y > 0]
     if len(pts) < 3:
         return 0.0, 0.0
     xs, ys = zip(*pts)
     xs = np.array(xs, dtype=float)
     ys = np.array(ys, dtype=float)
+    from scipy.optimize import curve_fit
     popt, _ = curve_fit(heaps_law, xs, ys, bounds=([0,0], [1e12, 1]))
-    K, beta = popt
+    return popt[0], popt[1]
+
+def fit_heaps(growth_points):
+    K, beta = _fit_heaps(growth_points)
     log(f"Heaps’ Law fit: K={K:.4g}, beta={beta:.4f}")
     return K, beta
 
-def analyze_tokens(blob_ids):
-    total_tokens_per_blob = []
-    unique_tokens_per_blob = []
-    global_token_set = set()
-    global_total_tokens = 0
+def heaps_beta_se(totals, blob_vocab, reps=HEAPS_RESAMPLES, seed=12345):
+    """Standard error of Heaps beta from refitting random half-samples of the
+    blobs (delete-n/2 jackknife: the half-sample spread estimates the SE of
+    the full-sample beta directly).
+
+    Consecutive growth points share almost all their tokens, so the curve_fit
+    covariance treats them as far more independent than they are. Resampling
+    with replacement does not work either: a repeated blob adds tokens but no
+    new vocabulary, which bends the curve. `blob_vocab` holds each blob's
+    distinct token ids, aligned with `totals`.
+    """
+    n = len(totals)
+    m = n // 2
+    if m < 3:
+        return float("inf")
+    totals = np.asarray(totals, dtype=np.int64)
+    sizes = np.array([v.size for v in blob_vocab], dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    betas = []
+    for _ in range(reps):
+        order = rng.permutation(n)[:m]
+        ids = np.concatenate([blob_vocab[i] for i in order.tolist()])
+        # a token is new at the first blob of the half-sample that contains it
+        _, first = np.unique(ids, return_index=True)
+        new = np.bincount(np.repeat(np.arange(m), sizes[order])[first], minlength=m)
+        betas.append(_fit_heaps(zip(np.cumsum(totals[order]).tolist(), np.cumsum(new).tolist()))[1])
+    return float(np.std(betas, ddof=1))
 
-    growth_points = []  # track vocab growth for Heaps’ Law
+def new_token_state(dedup=False, per_blob=False):
+    """With dedup, blobs found to be near-duplicates of an earlier blob are
+    skipped and counted in "dropped". With per_blob, "blobs" lists the counted
+    blobs (aligned with "totals" and "uniques"), "vocab" maps each token seen
+    to an id and "blob_vocab" keeps each counted blob's distinct token ids;
+    otherwise "vocab" is just the set of tokens seen."""
+    return {"totals": [], "uniques": [], "vocab": {} if per_blob else set(), "total": 0, "growth": [],
+            "blobs": [] if per_blob else None, "blob_vocab": [] if per_blob else None,
+            "lsh": LSHIndex() if dedup else None, "dropped": 0}
+
+def analyze_tokens(blob_ids, freq=None, state=None):
+    """Tokenize blobs; pass the same `state` to keep accumulating across batches."""
+    if state is None:
+        state = new_token_state()
+    total_tokens_per_blob = state["totals"]
+    unique_tokens_per_blob = state["uniques"]
+    vocab = state["vocab"]
+    growth_points = state["growth"]  # track vocab growth for Heaps’ Law
 
     for idx, blob in enumerate(blob_ids, 1):
         raw = get_blob_content(blob)
         toks = tokenize(raw)
         if not toks:
             continue
+        if state["lsh"] is not None and state["lsh"].add_tokens(blob, toks) is not None:
+            state["dropped"] += 1
+            continue
         total_tokens_per_blob.append(len(toks))
-        unique_tokens_per_blob.append(len(set(toks)))
-        global_total_tokens += len(toks)
-        global_token_set.update(toks)
+        distinct = set(toks)
+        unique_tokens_per_blob.append(len(distinct))
+        state["total"] += len(toks)
+        if state["blob_vocab"] is None:
+            vocab.update(distinct)
+        else:
+            state["blobs"].append(blob)
+            state["blob_vocab"].append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in distinct),
+                                                   dtype=np.int32, count=len(distinct)))
+        if freq is not None:
+            freq.update(toks)
 
         # record growth
-        growth_points.append((global_total_tokens, len(global_token_set)))
+        growth_points.append((state["total"], len(vocab)))
 
         if idx % 50 == 0:
             log(f"Processed {idx}/{len(blob_ids)} blobs...")
 
-    return total_tokens_per_blob, unique_tokens_per_blob, global_total_tokens, len(global_token_set), growth_points
-
-def compute_stats(values, label, fname):
-    values = np.asarray(values)
-    stats = {
-        "count": int(values.size),
-        "mean": float(np.mean(values)) if values.size else 0,
-        "median": float(np.median(values)) if values.size else 0,
-        "std": float(np.std(values, ddof=1)) if values.size > 1 else 0,
-        "var": float(np.var(values, ddof=1)) if values.size > 1 else 0,
-        "skew": float(skew(values, bias=False)) if values.size > 1 else 0,
-        "kurtosis": float(kurtosis(values, bias=False)) if values.size > 1 else 0,
-        "q1": float(np.percentile(values, 25)) if values.size else 0,
-        "q2": float(np.percentile(values, 50)) if values.size else 0,
-        "q3": float(np.percentile(values, 75)) if values.size else 0,
-        "min": float(np.min(values)) if values.size else 0,
-        "max": float(np.max(values)) if values.size else 0,
-    }
+    return total_tokens_per_blob, unique_tokens_per_blob, state["total"], len(vocab), growth_points
+
+def analyze_tokens_adaptive(handles, store, freq, precision, batch_size=ADAPTIVE_BATCH, dedup=False):
+    """Tokenize blobs in random batches until mean/median tokens per blob and
+    Heaps beta reach the requested relative precision (95% CI half-width).
+    Candidates stay as `store` handles; only the current batch is turned into
+    hex IDs."""
+    state = new_token_state(dedup, per_blob=True)
+    estimator = SequentialEstimator(("mean", "median"), precision=precision)
+    processed = []
+    beta_se, se_at = float("inf"), 0
+    for batch in shuffled_batches(handles, batch_size):
+        batch = store.hex_many(batch)
+        done = len(state["totals"])
+        analyze_tokens(batch, freq, state)
+        processed.extend(batch)
+        estimator.add(state["totals"][done:])
+        _, beta = _fit_heaps(state["growth"])
+        # each refit pass costs O(n), so it is redone only once the sample has
+        # grown by HEAPS_SE_GROWTH; in between the last (larger) SE stands
+        if len(state["totals"]) >= HEAPS_SE_GROWTH * se_at:
+            se_at = len(state["totals"])
+            beta_se = heaps_beta_se(state["totals"], state["blob_vocab"])
+        estimator.set_precision("heaps_beta", 1.96 * beta_se / beta if beta > 0 else float("inf"))
+        log(f"Adaptive: {len(processed)}/{len(handles)} blobs, {estimator.describe()}")
+        if estimator.converged():
+            log(f"Target precision {precision} reached after {len(processed)} blobs.")
+            break
+    return state, estimator, processed
+
+def write_token_frequencies(freq, fname, summary_fname):
+    """Frequency-rank table of the heaviest tokens plus a Zipf exponent fit."""
+    rows = freq.rank_table(RANK_TABLE_SIZE)
     outpath = os.path.join(HOME, fname)
     with open(outpath, "w") as f:
-        for k, v in stats.items():
-            f.write(f"{k}: {v}\n")
-    log(f"{label} stats written to {outpath}")
-    return stats
+        f.write("rank\ttoken\tcount_est\tcount_lower_bound\n")
+        for rank, tok, est, low in rows:
+            f.write(f"{rank}\t{tok}\t{est}\t{low}\n")
+    log(f"Token frequency-rank table written to {outpath}")
+
+    s, c, r2, n = fit_zipf(rows, min_count=ZIPF_MIN_COUNT)
+    with open(os.path.join(HOME, summary_fname), "w") as f:
+        f.write(f"Total tokens: {freq.total}\n")
+        f.write(f"Ranks fitted: {n}\n")
+        f.write(f"Zipf exponent s={s:.6f}, log-intercept={c:.6f}, r^2={r2:.6f}\n")
+        f.write(f"Count-min sketch: width={freq.sketch.width}, depth={freq.sketch.depth}\n")
+    log(f"Zipf fit: s={s:.4f} (r^2={r2:.4f}) over {n} ranks")
+    return s
 
 def make_boxplot(values, label, fname, logscale=False):
+    plt = pyplot()
     plt.figure(figsize=(8,6))
     plt.boxplot(values, vert=True, showfliers=False, labels=[label])
     plt.title(f"{label} {'(Log)' if logscale else '(Linear)'}")
@@ -119,6 +214,7 @@ def make_boxplot(values, label, fname, logscale=False):
     safe_savefig(fname)
 
 def make_cdf(values, label, fname, logx=False):
+    plt = pyplot()
     sorted_vals = np.sort(values)
     y = np.arange(1, len(sorted_vals)+1) / len(sorted_vals)
     plt.figure(figsize=(10,6))
@@ -130,13 +226,37 @@ def make_cdf(values, label, fname, logx=False):
         plt.xscale("log")
     safe_savefig(fname)
 
-def main():
-    with open("blob_ids.txt") as f:
-        all_blobs = [line.strip() for line in f if line.strip()]
-    sample = random.sample(all_blobs, min(SAMPLE_SIZE, len(all_blobs)))
-    log(f"Loaded {len(sample)} blob IDs to process.")
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Token statistics over sampled blobs.")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="process blobs in random batches until --precision is reached instead of a fixed SAMPLE_SIZE")
+    ap.add_argument("--precision", type=float, default=ADAPTIVE_PRECISION)
+    ap.add_argument("--batch", type=int, default=ADAPTIVE_BATCH)
+    ap.add_argument("--dedup", action="store_true",
+                    help="count one blob per MinHash/LSH near-duplicate cluster (vendored or copied files)")
+    args = ap.parse_args(argv)
 
-    totals, uniques, global_total, global_unique, growth_points = analyze_tokens(sample)
+    blob_store = shared_store("blobs")
+    all_blobs = load_blob_ids("blob_ids.txt", blob_store)
+    freq = TokenFrequency()
+    precision = {}
+    if args.adaptive:
+        log(f"Loaded {len(all_blobs)} candidate blob IDs (adaptive, precision {args.precision}).")
+        state, estimator, sample = analyze_tokens_adaptive(
+            all_blobs, blob_store, freq, args.precision, args.batch, args.dedup)
+        totals, uniques, global_total, global_unique, growth_points = (
+            state["totals"], state["uniques"], state["total"], len(state["vocab"]), state["growth"])
+        precision = estimator.summary()
+    else:
+        picked = np.random.default_rng().choice(all_blobs, size=min(SAMPLE_SIZE, len(all_blobs)), replace=False)
+        sample = blob_store.hex_many(picked)
+        log(f"Loaded {len(sample)} blob IDs to process.")
+        state = new_token_state(args.dedup)
+        totals, uniques, global_total, global_unique, growth_points = analyze_tokens(sample, freq, state)
+    dedup = {}
+    if state["lsh"] is not None:
+        dedup = write_cluster_report(state["lsh"], "Token near-duplicates", "token_near_duplicate",
+                                     dropped=state["dropped"])
 
     log(f"Global totals across sample:")
     log(f"  Total tokens = {global_total}")
@@ -151,10 +271,18 @@ def main():
         f.write(f"Heaps K={K:.6g}, beta={beta:.6f}\n")
         f.write(f"TOTAL_BLOBS: {TOTAL_BLOBS}\n")
         f.write(f"Heaps projected unique tokens: {est_total}\n")
+        if "heaps_beta_rel_precision" in precision:
+            f.write(f"Heaps beta relative precision: {precision['heaps_beta_rel_precision']}\n")
+        if dedup:
+            f.write(f"Near-duplicate blobs dropped: {dedup['near_duplicate_blobs_dropped']}\n")
     log("[STATS] heaps_law_summary.txt written")
 
-    compute_stats(totals, "Tokens per Blob", "tokens_per_blob_stats.txt")
-    compute_stats(uniques, "Unique Tokens per Blob", "unique_tokens_per_blob_stats.txt")
+    write_token_frequencies(freq, "token_frequency_rank.tsv", "token_zipf_summary.txt")
+
+    compute_and_save_stats(totals, "Tokens per Blob", "tokens_per_blob_stats.txt",
+                           extra={**precision, **dedup}, extremes=True)
+    compute_and_save_stats(uniques, "Unique Tokens per Blob", "unique_tokens_per_blob_stats.txt",
+                           extremes=True)
 
     make_boxplot(totals, "Tokens per Blob", "tokens_per_blob_box_linear.png")
     make_boxplot(totals, "Tokens per Blob", "tokens_per_blob_box_log.png", logscale=True)
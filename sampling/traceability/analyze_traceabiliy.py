@@ -4,10 +4,22 @@
 # cat blob_ids.txt | ~/lookup/getValues -f b2f > blob_files.tsv
 
 #!/usr/bin/env python3
-import os, re, sys, base64, subprocess
+#Large dumps can be split across worker processes (map-reduce over line ranges):
+# python analyze_traceabiliy.py --shards 32 --workers 16
+# python analyze_traceabiliy.py --content part_*.txt --files blob_files_*.tsv --workers 16
+#Add --dedup to count one blob per near-duplicate (MinHash/LSH) cluster of vendored/copied files.
+import os, re, sys, time, base64, argparse, subprocess, tempfile, shutil
 from collections import Counter, defaultdict
-import pandas as pd
-import matplotlib.pyplot as plt
+from itertools import compress
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from woclib.common import memoized, pyplot, sha1_mask
+from woclib.shaid import ShaStore
+from woclib.domains import DomainClassifier
+from woclib.minhash import LSHIndex, MinHasher, write_cluster_report
+from woclib.tokenfreq import tokenize
 
 # ---------- Config ----------
 BLOB_CONTENT_FILE = "blobs_sample_content.txt"
@@ -18,53 +30,126 @@ BATCH             = 5000
 
 GETVALUES = os.path.expanduser("~/lookup/getValues")
 
-# Internal (not foreign) URL domains
+# Internal (not foreign) URL domains; any host under the same registrable
+# domain (e.g. objects.githubusercontent.com) counts as internal too
 INTERNAL_DOMAINS = {
     "github.com","gist.github.com","raw.githubusercontent.com","api.github.com",
     "gitlab.com","bitbucket.org"
 }
+DOMAINS = DomainClassifier(INTERNAL_DOMAINS)
 
 # Regex for URLs
 URL_RE = re.compile(r"https?://[^\s)\"'>]+")
 
-def parse_blobs_one_line(path):
-    """Read blobs_sample_content.txt and decode base64 into text blobs."""
-    blobs_text = {}
+def decode_text_blob(line):
+    """(blob, text) for a `blob;base64` line, text None unless it is text-like."""
+    parts = line.rstrip("\n").split(";", 1)
+    if len(parts) != 2:
+        return None, None
+    blob, b64 = parts
+    try:
+        raw = base64.b64decode(b64, validate=False)
+    except Exception:
+        return blob, None
+    if b"\x00" in raw:  # binary check
+        return blob, None
+    text = raw.decode("utf-8", errors="ignore")
+    if not text:
+        return blob, None
+    printable = sum(1 for ch in text if (ch >= " " or ch in "\n\r\t"))
+    if printable / max(1, len(text)) < 0.95:
+        return blob, None
+    if len(raw) > 1_000_000:
+        return blob, None
+    return blob, text
+
+def parse_blobs_one_line(path, store):
+    """Read blobs_sample_content.txt and decode base64 into text blobs,
+    keyed by interned blob handle."""
+    text_ids, texts = [], []
     total, textlike = 0, 0
     with open(path, "r") as f:
         for line in f:
             total += 1
-            parts = line.rstrip("\n").split(";", 1)
-            if len(parts) != 2:
-                continue
-            blob, b64 = parts
-            try:
-                raw = base64.b64decode(b64, validate=False)
-            except Exception:
-                continue
-            if b"\x00" in raw:  # binary check
+            blob, text = decode_text_blob(line)
+            if text is None:
                 continue
-            text = raw.decode("utf-8", errors="ignore")
-            if not text:
-                continue
-            printable = sum(1 for ch in text if (ch >= " " or ch in "\n\r\t"))
-            if printable / max(1, len(text)) < 0.95:
-                continue
-            if len(raw) > 1_000_000:
-                continue
-            blobs_text[blob] = text
+            text_ids.append(blob)
+            texts.append(text)
             textlike += 1
+    ok = sha1_mask(text_ids, "blob ids")
+    text_ids, texts = list(compress(text_ids, ok)), list(compress(texts, ok))
+    blobs_text = dict(zip(store.intern_many(text_ids).tolist(), texts))
     return blobs_text, total, textlike
 
+def write_dedup_summary(summary):
+    with open(os.path.join(OUTDIR, "near_duplicate_summary.txt"), "w") as f:
+        for k, v in summary.items():
+            f.write(f"{k}: {v}\n")
+
+def drop_near_duplicates(blobs_text, store):
+    """Keep the first blob of each near-duplicate cluster; returns the kept
+    blobs and the hex ids of the dropped ones."""
+    hexes = store.hex_many(list(blobs_text))
+    lsh = LSHIndex()
+    for blob, text in zip(hexes, blobs_text.values()):
+        lsh.add_tokens(blob, tokenize(text))
+    dropped = lsh.duplicate_keys()
+    write_dedup_summary(write_cluster_report(lsh, "Blob near-duplicates", "trace_near_duplicate"))
+    kept = {h: t for (h, t), x in zip(blobs_text.items(), hexes) if x not in dropped}
+    return kept, dropped
+
+def split_ranges(path, n, key_aligned=False):
+    """Split a file into up to n byte ranges that start on line boundaries.
+
+    With key_aligned, a boundary is pushed past every line sharing the first
+    column of the line it lands on, so no key is split across ranges.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, n):
+            pos = max(size * i // n, bounds[-1])
+            if pos >= size:
+                break
+            f.seek(pos)
+            if pos > 0:
+                f.readline()
+            if key_aligned:
+                start = f.tell()
+                first = f.readline()
+                key = first.split(b";", 1)[0]
+                start += len(first)
+                while first:
+                    line = f.readline()
+                    if not line or line.split(b";", 1)[0] != key:
+                        break
+                    start += len(line)
+                f.seek(start)
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def iter_range_lines(path, start, end):
+    """Text lines whose first byte lies in [start, end)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode("utf-8", errors="ignore")
+
 def extract_urls(text):
     return URL_RE.findall(text)
 
 def domain_of(url):
-    try:
-        return url.split("/")[2].lower()
-    except Exception:
-        return None
+    """Registrable domain of a URL (port, userinfo and subdomains dropped)."""
+    return DOMAINS.domain_of(url)
 
+@memoized
 def run_getvalues(map_name, keys):
     if not keys:
         return []
@@ -97,33 +182,39 @@ def parse_b2tac_lines(lines):
                 continue
         if ts is None:
             continue
-        year = pd.to_datetime(ts, unit="s").year
-        blob_year[blob] = year
+        try:
+            blob_year[blob] = time.gmtime(ts).tm_year
+        except (OverflowError, OSError, ValueError):
+            continue
     return blob_year
 
 
+EXT_TO_LANG = {
+    ".py":"Python",".ipynb":"Jupyter",".js":"JavaScript",".ts":"TypeScript",
+    ".tsx":"TypeScript",".jsx":"JavaScript",".java":"Java",".c":"C",".h":"C",
+    ".cpp":"C++",".cc":"C++",".cxx":"C++",".hpp":"C++",".hh":"C++",
+    ".rb":"Ruby",".go":"Go",".php":"PHP",".rs":"Rust",".kt":"Kotlin",
+    ".swift":"Swift",".m":"Objective-C",".scala":"Scala",".cs":"C#",
+    ".sh":"Shell",".bash":"Shell",".zsh":"Shell",".ps1":"PowerShell",
+    ".json":"JSON",".yml":"YAML",".yaml":"YAML",".xml":"XML",".toml":"TOML",
+    ".ini":"INI",".cfg":"CFG",".md":"Markdown",".rst":"reStructuredText",
+    ".txt":"Text",".html":"HTML",".css":"CSS",".sql":"SQL",".pl":"Perl",
+    ".lua":"Lua",".r":"R",".dart":"Dart"
+}
+
+def add_blob_file_line(blob_to_langs, ln):
+    if ";" not in ln:
+        return
+    blob, path = ln.rstrip("\n").split(";", 1)
+    _, ext = os.path.splitext(os.path.basename(path))
+    if ext in EXT_TO_LANG:
+        blob_to_langs[blob].add(EXT_TO_LANG[ext])
+
 def parse_blob_files(blob_files_tsv):
-    ext_to_lang = {
-        ".py":"Python",".ipynb":"Jupyter",".js":"JavaScript",".ts":"TypeScript",
-        ".tsx":"TypeScript",".jsx":"JavaScript",".java":"Java",".c":"C",".h":"C",
-        ".cpp":"C++",".cc":"C++",".cxx":"C++",".hpp":"C++",".hh":"C++",
-        ".rb":"Ruby",".go":"Go",".php":"PHP",".rs":"Rust",".kt":"Kotlin",
-        ".swift":"Swift",".m":"Objective-C",".scala":"Scala",".cs":"C#",
-        ".sh":"Shell",".bash":"Shell",".zsh":"Shell",".ps1":"PowerShell",
-        ".json":"JSON",".yml":"YAML",".yaml":"YAML",".xml":"XML",".toml":"TOML",
-        ".ini":"INI",".cfg":"CFG",".md":"Markdown",".rst":"reStructuredText",
-        ".txt":"Text",".html":"HTML",".css":"CSS",".sql":"SQL",".pl":"Perl",
-        ".lua":"Lua",".r":"R",".dart":"Dart"
-    }
     blob_to_langs = defaultdict(set)
     with open(blob_files_tsv, "r", encoding="utf-8", errors="ignore") as f:
         for ln in f:
-            if ";" not in ln:
-                continue
-            blob, path = ln.rstrip("\n").split(";", 1)
-            _, ext = os.path.splitext(os.path.basename(path))
-            if ext in ext_to_lang:
-                blob_to_langs[blob].add(ext_to_lang[ext])
+            add_blob_file_line(blob_to_langs, ln)
     return blob_to_langs
 
 def classify_script_mix(text):
@@ -139,18 +230,74 @@ def classify_script_mix(text):
             scripts["cjk"] += 1
     return {s for s,c in scripts.items() if c >= 20}
 
-def main():
+def is_foreign(d):
+    return not DOMAINS.is_internal_domain(d)
+
+def write_url_totals(total_urls, foreign_urls):
+    print(f"[INFO] Total URLs (raw): {total_urls:,}")
+    print(f"[INFO] Foreign URLs (raw): {foreign_urls:,} ({foreign_urls/total_urls:.2%})")
+
+    with open(os.path.join(OUTDIR, "foreign_url_totals.txt"), "w") as f:
+        f.write(f"Total URLs: {total_urls}\n")
+        f.write(f"Foreign URLs: {foreign_urls}\n")
+        f.write(f"Percent foreign: {foreign_urls/total_urls:.2%}\n")
+
+def write_foreign_counts(foreign_by_source, foreign_by_year):
+    import pandas as pd
+    pd.Series(foreign_by_source, dtype="int64").rename_axis("source").rename(
+        "foreign_url_count").sort_index().to_csv(os.path.join(OUTDIR, "foreign_url_counts.tsv"), sep="\t")
+    pd.Series(foreign_by_year, dtype="int64").rename_axis("year").rename(
+        "foreign_url_count").sort_index().to_csv(os.path.join(OUTDIR, "foreign_urls_per_year.tsv"), sep="\t")
+
+    total_foreign_urls = sum(foreign_by_source.values())
+    print(f"Total foreign URLs: {total_foreign_urls}")
+    with open(os.path.join(OUTDIR, "total_foreign_urls.txt"), "w") as f:
+        f.write(f"Total foreign URLs in sample: {total_foreign_urls}\n")
+
+def write_summary(total_sampled, textlike, blobs_with_urls, url_domains_blob, prog_multi, nl_multi_count):
+    import pandas as pd
+    plt = pyplot()
+    print("\n=== Summary ===")
+    print(f"Total blobs analyzed: {total_sampled:,}")
+    print(f"Text-like blobs:      {textlike:,}")
+    print(f"Blobs with URLs:      {blobs_with_urls:,}")
+    print("Top 10 URL domains:")
+    for dom, count in url_domains_blob.most_common(10):
+        print(f"  {dom}: {count}")
+    print(f"Programming multi-language blobs: {prog_multi}")
+    print(f"Natural-language multi-script blobs: {nl_multi_count}")
+    print("================\n")
+
+    with open(os.path.join(OUTDIR, "text_blob_count.txt"), "w") as f:
+        f.write(f"Text-like blobs in sample: {textlike} of {total_sampled}\n")
+
+    pd.Series(url_domains_blob).to_csv(os.path.join(OUTDIR, "url_domains.tsv"), sep="\t")
+    with open(os.path.join(OUTDIR, "multilang_summary.txt"), "w") as out:
+        out.write(f"Programming multi-language blobs: {prog_multi}\n")
+        out.write(f"Natural-language multi-script blobs: {nl_multi_count}\n")
+
+    df = pd.read_csv(os.path.join(OUTDIR, "url_domains.tsv"), sep="\t", header=None, names=["domain","count"])
+    df = df.sort_values("count", ascending=False).head(20)
+    fig = df.plot(kind="bar", x="domain", y="count", legend=False,
+                  title="Top URL Domains").get_figure()
+    fig.savefig(os.path.join(OUTDIR, "trace_top_url_domains.png"), dpi=150, bbox_inches="tight")
+    plt.close(fig)
 
-    blobs_text, total_sampled, textlike = parse_blobs_one_line(BLOB_CONTENT_FILE)
+def run_single(content_file, files_tsv, dedup=False):
+    import pandas as pd
+    blob_ids = ShaStore()
+    blobs_text, total_sampled, textlike = parse_blobs_one_line(content_file, blob_ids)
     print(f"[INFO] Blob content lines: {total_sampled:,}")
     print(f"[INFO] Text-like blobs:    {textlike:,}")
+    dropped = set()
+    if dedup:
+        blobs_text, dropped = drop_near_duplicates(blobs_text, blob_ids)
 
     blob_has_url = set()
     url_domains_blob = Counter()
     url_sources = []
     for blob, text in blobs_text.items():
-        for url in extract_urls(text):
-            dom = domain_of(url)
+        for dom, _ in DOMAINS.classify_many(extract_urls(text)):
             if not dom:
                 continue
             blob_has_url.add(blob)
@@ -159,23 +306,19 @@ def main():
 
 
     total_urls = len(url_sources)
-    foreign_urls = sum(1 for (_, dom, _, _) in url_sources if dom not in INTERNAL_DOMAINS)
-
-    print(f"[INFO] Total URLs (raw): {total_urls:,}")
-    print(f"[INFO] Foreign URLs (raw): {foreign_urls:,} ({foreign_urls/total_urls:.2%})")
-
-    with open(os.path.join(OUTDIR, "foreign_url_totals.txt"), "w") as f:
-        f.write(f"Total URLs: {total_urls}\n")
-        f.write(f"Foreign URLs: {foreign_urls}\n")
-        f.write(f"Percent foreign: {foreign_urls/total_urls:.2%}\n")
+    foreign_urls = sum(1 for (_, dom, _, _) in url_sources if is_foreign(dom))
+    write_url_totals(total_urls, foreign_urls)
 
     blob_to_year = {}
     blobs_needing_time = list(blob_has_url)
     print(f"[INFO] Querying b2tac for {len(blobs_needing_time):,} blobs...")
     for i in range(0, len(blobs_needing_time), BATCH):
-        chunk = blobs_needing_time[i:i+BATCH]
+        chunk = blob_ids.hex_many(blobs_needing_time[i:i+BATCH])
         lines = run_getvalues("b2tac", chunk)
-        blob_to_year.update(parse_b2tac_lines(lines))
+        years = parse_b2tac_lines(lines)
+        years = dict(compress(years.items(), sha1_mask(list(years), "b2tac blob ids")))
+        handles = blob_ids.lookup_many(list(years))
+        blob_to_year.update((h, y) for h, y in zip(handles.tolist(), years.values()) if h >= 0)
 
     rows_with_time = []
     for source, dom, ident, yr in url_sources:
@@ -186,47 +329,160 @@ def main():
             rows_with_time.append((source, dom, ident, yr2))
 
     url_df = pd.DataFrame(rows_with_time, columns=["source","domain","id","year"])
+    url_df["id"] = blob_ids.hex_many(url_df["id"].to_numpy(dtype=np.int64))
     url_df.to_csv(os.path.join(OUTDIR, "urls_labeled_over_time.tsv"), sep="\t", index=False)
 
-    def is_foreign(d): return d not in INTERNAL_DOMAINS
     foreign_df = url_df[url_df["domain"].map(is_foreign)]
-    foreign_counts = foreign_df.groupby("source").size().rename("foreign_url_count")
-    foreign_counts.to_csv(os.path.join(OUTDIR, "foreign_url_counts.tsv"), sep="\t")
-
-    total_foreign_urls = len(foreign_df)
-    print(f"Total foreign URLs: {total_foreign_urls}")
-    with open(os.path.join(OUTDIR, "total_foreign_urls.txt"), "w") as f:
-        f.write(f"Total foreign URLs in sample: {total_foreign_urls}\n")
+    write_foreign_counts(foreign_df.groupby("source").size().to_dict(),
+                         foreign_df.groupby("year").size().to_dict())
 
-    blob_to_langs = parse_blob_files(BLOB_FILES_TSV)
-    prog_multi = sum(1 for langs in blob_to_langs.values() if len(langs) > 1)
+    blob_to_langs = parse_blob_files(files_tsv)
+    prog_multi = sum(1 for blob, langs in blob_to_langs.items() if len(langs) > 1 and blob not in dropped)
     nl_multi_count = sum(1 for text in blobs_text.values() if len(classify_script_mix(text)) > 1)
 
-    print("\n=== Summary ===")
-    print(f"Total blobs analyzed: {total_sampled:,}")
-    print(f"Text-like blobs:      {textlike:,}")
-    print(f"Blobs with URLs:      {len(blob_has_url):,}")
-    print("Top 10 URL domains:")
-    for dom, count in url_domains_blob.most_common(10):
-        print(f"  {dom}: {count}")
-    print(f"Programming multi-language blobs: {prog_multi}")
-    print(f"Natural-language multi-script blobs: {nl_multi_count}")
-    print("================\n")
-
-    with open(os.path.join(OUTDIR, "text_blob_count.txt"), "w") as f:
-        f.write(f"Text-like blobs in sample: {textlike} of {total_sampled}\n")
+    write_summary(total_sampled, textlike, len(blob_has_url), url_domains_blob,
+                  prog_multi, nl_multi_count)
+
+# ---------- Sharded (map-reduce) mode ----------
+def map_signature_shard(task):
+    """(hex blob ids, MinHash signatures) of the text blobs in one line range."""
+    path, start, end = task
+    hasher = MinHasher()
+    blobs, sigs = [], []
+    for line in iter_range_lines(path, start, end):
+        blob, text = decode_text_blob(line)
+        if text is None:
+            continue
+        sig = hasher.signature(tokenize(text))
+        if sig is not None:
+            blobs.append(blob)
+            sigs.append(sig)
+    return blobs, sigs
+
+def map_content_shard(task):
+    """Partial URL / script-mix results for one line range of a content dump.
+
+    URL rows with a known year are written to `part_path`; everything else
+    comes back as counters that the reducer sums.
+    """
+    path, start, end, part_path, skip = task
+    total, textlike, nl_multi = 0, 0, 0
+    domains = Counter()
+    blob_domains = defaultdict(list)
+    for line in iter_range_lines(path, start, end):
+        total += 1
+        blob, text = decode_text_blob(line)
+        if text is None:
+            continue
+        textlike += 1
+        if blob in skip:
+            continue
+        if len(classify_script_mix(text)) > 1:
+            nl_multi += 1
+        for dom, _ in DOMAINS.classify_many(extract_urls(text)):
+            if not dom:
+                continue
+            domains[dom] += 1
+            blob_domains[blob].append(dom)
 
-    pd.Series(url_domains_blob).to_csv(os.path.join(OUTDIR, "url_domains.tsv"), sep="\t")
-    with open(os.path.join(OUTDIR, "multilang_summary.txt"), "w") as out:
-        out.write(f"Programming multi-language blobs: {prog_multi}\n")
-        out.write(f"Natural-language multi-script blobs: {nl_multi_count}\n")
+    blob_to_year = {}
+    url_blobs = list(blob_domains)
+    for i in range(0, len(url_blobs), BATCH):
+        blob_to_year.update(parse_b2tac_lines(run_getvalues("b2tac", url_blobs[i:i+BATCH])))
+
+    foreign_by_source, foreign_by_year = Counter(), Counter()
+    with open(part_path, "w") as out:
+        for blob, doms in blob_domains.items():
+            year = blob_to_year.get(blob)
+            if year is None:
+                continue
+            for dom in doms:
+                out.write(f"blob_text\t{dom}\t{blob}\t{year}\n")
+                if is_foreign(dom):
+                    foreign_by_source["blob_text"] += 1
+                    foreign_by_year[year] += 1
+
+    total_urls = sum(domains.values())
+    return {
+        "total": total, "textlike": textlike, "nl_multi": nl_multi,
+        "url_blobs": len(blob_domains), "domains": domains,
+        "total_urls": total_urls,
+        "foreign_urls": sum(c for d, c in domains.items() if is_foreign(d)),
+        "foreign_by_source": foreign_by_source, "foreign_by_year": foreign_by_year,
+        "part_path": part_path,
+    }
 
-    df = pd.read_csv(os.path.join(OUTDIR, "url_domains.tsv"), sep="\t", header=None, names=["domain","count"])
-    df = df.sort_values("count", ascending=False).head(20)
-    fig = df.plot(kind="bar", x="domain", y="count", legend=False,
-                  title="Top URL Domains").get_figure()
-    fig.savefig(os.path.join(OUTDIR, "trace_top_url_domains.png"), dpi=150, bbox_inches="tight")
-    plt.close(fig)
+def map_files_shard(task):
+    """Multi-language blob count for one key-aligned range of a b2f dump."""
+    path, start, end, skip = task
+    blob_to_langs = defaultdict(set)
+    for ln in iter_range_lines(path, start, end):
+        add_blob_file_line(blob_to_langs, ln)
+    return sum(1 for blob, langs in blob_to_langs.items() if len(langs) > 1 and blob not in skip)
+
+def run_sharded(content_files, files_tsvs, shards, workers, dedup=False):
+    with tempfile.TemporaryDirectory(prefix="trace_parts_", dir=OUTDIR) as work:
+        ranges = [(path, start, end) for path in content_files
+                  for start, end in split_ranges(path, shards)]
+        files_ranges = [(path, start, end) for path in files_tsvs
+                        for start, end in split_ranges(path, shards, key_aligned=True)]
+        print(f"[INFO] {len(ranges)} content shards, {len(files_ranges)} b2f shards, {workers} workers")
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            skip = frozenset()
+            if dedup:
+                # signatures are mapped per shard; the LSH index is built here, in input order
+                lsh = LSHIndex()
+                for blobs, sigs in pool.map(map_signature_shard, ranges):
+                    for blob, sig in zip(blobs, sigs):
+                        lsh.add(blob, sig)
+                skip = frozenset(lsh.duplicate_keys())
+                write_dedup_summary(write_cluster_report(lsh, "Blob near-duplicates",
+                                                         "trace_near_duplicate"))
+            content_tasks = [(path, start, end, os.path.join(work, f"part_{i}.tsv"), skip)
+                             for i, (path, start, end) in enumerate(ranges)]
+            partials = list(pool.map(map_content_shard, content_tasks))
+            prog_multi = sum(pool.map(map_files_shard, [r + (skip,) for r in files_ranges]))
+
+        total_sampled = sum(p["total"] for p in partials)
+        textlike = sum(p["textlike"] for p in partials)
+        print(f"[INFO] Blob content lines: {total_sampled:,}")
+        print(f"[INFO] Text-like blobs:    {textlike:,}")
+
+        url_domains_blob, foreign_by_source, foreign_by_year = Counter(), Counter(), Counter()
+        for p in partials:
+            url_domains_blob.update(p["domains"])
+            foreign_by_source.update(p["foreign_by_source"])
+            foreign_by_year.update(p["foreign_by_year"])
+        write_url_totals(sum(p["total_urls"] for p in partials),
+                         sum(p["foreign_urls"] for p in partials))
+
+        with open(os.path.join(OUTDIR, "urls_labeled_over_time.tsv"), "w") as out:
+            out.write("source\tdomain\tid\tyear\n")
+            for p in partials:
+                with open(p["part_path"], "r") as part:
+                    shutil.copyfileobj(part, out)
+        write_foreign_counts(foreign_by_source, foreign_by_year)
+
+    write_summary(total_sampled, textlike, sum(p["url_blobs"] for p in partials),
+                  url_domains_blob, prog_multi, sum(p["nl_multi"] for p in partials))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="URL traceability and language-mix analysis of sampled blobs.")
+    ap.add_argument("--content", nargs="+", default=[BLOB_CONTENT_FILE],
+                    help="showCnt blob 1 dumps (one or more files)")
+    ap.add_argument("--files", nargs="+", default=[BLOB_FILES_TSV],
+                    help="getValues b2f outputs (one or more files)")
+    ap.add_argument("--shards", type=int, default=1, help="line-range shards per input file")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--dedup", action="store_true",
+                    help="analyze one blob per MinHash/LSH near-duplicate cluster")
+    args = ap.parse_args(argv)
+
+    if args.shards <= 1 and args.workers <= 1 and len(args.content) == 1 and len(args.files) == 1:
+        run_single(args.content[0], args.files[0], args.dedup)
+    else:
+        run_sharded(args.content, args.files, max(1, args.shards), max(1, args.workers), args.dedup)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
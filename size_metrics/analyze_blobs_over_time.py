@@ -4,21 +4,38 @@
 
 #!/usr/bin/env python3
 import os
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from scipy.stats import skew, kurtosis
+import sys
 
-HOME = os.path.expanduser("~")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from woclib import monthly_state
+from woclib.common import HOME, pyplot, safe_savefig, memoized
 
-def safe_savefig(name):
-    out = os.path.join(HOME, name)
-    plt.savefig(out, bbox_inches="tight")
-    print(f"[SAVED] {out}")
+FIRST_SEEN_FILE = "blob_first_seen.tsv"
+STATE_FILE = os.path.join(HOME, "blobs_over_time_state.npz")
 
-def plot_counts(df, freq, label):
-    counts = df.groupby(pd.Grouper(key="date", freq=freq))["blob"].nunique()
-    cumulative_counts = counts.cumsum()
+@memoized
+def read_first_seen(path):
+    blobs, timestamps = [], []
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            parts = line.strip().split(";")
+            if len(parts) < 2:
+                continue
+            blob, ts = parts[0], parts[1]
+            try:
+                timestamps.append(int(ts))
+                blobs.append(blob)
+            except ValueError:
+                continue
+    return blobs, timestamps
+
+def plot_counts(state, label):
+    import pandas as pd
+    plt = pyplot()
+    months, counts, cumulative_counts = monthly_state.monthly_distinct(state, 2005, 2021)
+    index = pd.DatetimeIndex(monthly_state.month_end_index(months), name="date")
+    counts = pd.Series(counts, index=index)
+    cumulative_counts = pd.Series(cumulative_counts, index=index)
 
     counts = counts[counts > 0]
 
@@ -38,27 +55,35 @@ def plot_counts(df, freq, label):
 
     return counts, cumulative_counts
 
-def main():
-    print("[INFO] Reading blob_first_seen.tsv ...")
-    rows = []
-    with open("blob_first_seen.tsv", "r", errors="ignore") as f:
-        for line in f:
-            parts = line.strip().split(";")
-            if len(parts) < 2:
-                continue
-            blob, ts = parts[0], parts[1]
-            try:
-                ts = int(ts)
-                rows.append((blob, pd.to_datetime(ts, unit="s")))
-            except ValueError:
-                continue
+def main(argv=None):
+    # Additional b2fa outputs (new shards or WoC versions) can be passed as
+    # arguments; each file is folded into the saved sketches only once.
+    paths = (sys.argv[1:] if argv is None else argv) or [FIRST_SEEN_FILE]
+    state = monthly_state.load_state(STATE_FILE, distinct=True)
+    added = 0
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"[WARN] {path} not found")
+            continue
+        if monthly_state.already_folded(state, path):
+            print(f"[INFO] {path} already folded, skipping")
+            continue
+        print(f"[INFO] Reading {path} ...")
+        blobs, timestamps = read_first_seen(path)
+        monthly_state.fold_distinct(state, timestamps, blobs)
+        monthly_state.mark_folded(state, path)
+        added += 1
+    if added:
+        monthly_state.save_state(STATE_FILE, state)
+        print(f"[INFO] Folded {added} new file(s) into {STATE_FILE}")
 
-    df = pd.DataFrame(rows, columns=["blob", "date"])
-    df = df[(df["date"].dt.year >= 2005) & (df["date"].dt.year <= 2021)]
-    print(f"[INFO] Loaded {len(df)} valid rows from 2005–2021")
+    _, in_range = monthly_state.monthly_counts(state, 2005, 2021)
+    print(f"[INFO] Loaded {int(in_range.sum())} valid rows from 2005–2021")
+    if not in_range.any():
+        return
 
-    month_counts, month_cum = plot_counts(df, "ME", "Month")
+    month_counts, month_cum = plot_counts(state, "Month")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,23 +1,18 @@
 #!/usr/bin/env python3
 import os
+import sys
 import gzip
-import pandas as pd
-import matplotlib.pyplot as plt
 
-HOME = os.path.expanduser("~")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from woclib import monthly_state, stratified
+from woclib.common import HOME, log, pyplot, safe_savefig, memoized
 
-def log(msg):
-    print(f"[INFO] {msg}", flush=True)
+SAMPLE_PATH = "../sampling/sample/c2datSampleU.s.gz"
+STATE_FILE = os.path.join(HOME, "commits_over_time_state.npz")
 
-def safe_savefig(name):
-    out = os.path.join(HOME, name)
-    plt.savefig(out, bbox_inches="tight")
-    log(f"[SAVED] {out}")
-    plt.close()
-
-def load_commits_from_sample():
+@memoized
+def load_commits_from_sample(path=SAMPLE_PATH):
     timestamps = []
-    path = "../sampling/sample/c2datSampleU.s.gz"
     if not os.path.exists(path):
         log(f"Sample file not found: {path}")
         return []
@@ -38,19 +33,47 @@ def load_commits_from_sample():
     log(f"Loaded {len(timestamps)} commit timestamps total.")
     return timestamps
 
-def plot_over_time(timestamps):
-    df = pd.DataFrame({"ts": timestamps})
-    df["date"] = pd.to_datetime(df["ts"], unit="s")
+def fold_samples(state, paths):
+    """Fold sample files that are not yet part of the state; returns how many were added."""
+    added = 0
+    for path in paths:
+        if not os.path.exists(path):
+            log(f"Sample file not found: {path}")
+            continue
+        if monthly_state.already_folded(state, path):
+            log(f"Already folded, skipping: {path}")
+            continue
+        # stratified samples (woclib.stratified) carry per-year weights
+        weights = None
+        weights_path = stratified.weights_path_for(path)
+        try:
+            monthly_state.check_weighting(state, os.path.exists(weights_path), path)
+        except ValueError as e:
+            log(f"Skipping {e}")
+            continue
+        timestamps = load_commits_from_sample(path)
+        if os.path.exists(weights_path):
+            log(f"Applying stratum weights from {weights_path}")
+            weights = stratified.weights_for_timestamps(
+                timestamps, stratified.load_weights(weights_path))
+        monthly_state.fold_timestamps(state, timestamps, weights)
+        monthly_state.mark_folded(state, path)
+        added += 1
+    return added
 
+def plot_over_time(state):
+    import pandas as pd
+    plt = pyplot()
     # Filter 2005–2021
-    df = df[(df["date"].dt.year >= 2005) & (df["date"].dt.year <= 2021)]
-    log(f"Filtered to {len(df)} commits between 2005–2021.")
+    months, counts = monthly_state.monthly_counts(state, 2005, 2021)
+    log(f"Filtered to {int(counts.sum())} commits between 2005–2021.")
 
-    if df.empty:
+    if not counts.any():
         log("No commits in range — skipping plots.")
         return
 
-    monthly_counts = df.groupby(pd.Grouper(key="date", freq="ME")).size()
+    index = pd.DatetimeIndex(monthly_state.month_end_index(months), name="date")
+    monthly_counts = pd.Series(counts, index=index)
     monthly_cumulative = monthly_counts.cumsum()
 
     plt.figure(figsize=(12,6))
@@ -63,13 +86,22 @@ def plot_over_time(timestamps):
     plt.ylabel("Cumulative Commits")
     safe_savefig("commits_per_month_cumulative.png")
 
-def main():
-    timestamps = load_commits_from_sample()
-    if not timestamps:
+def main(argv=None):
+    # Extra c2dat shards can be passed as arguments; only files not seen
+    # before are read. Counts add up, so fold disjoint shards only: a newer
+    # WoC version repeats the older one's commits. Uniform and stratum-weighted
+    # samples count on different scales, so a state takes only one kind.
+    paths = (sys.argv[1:] if argv is None else argv) or [SAMPLE_PATH]
+    state = monthly_state.load_state(STATE_FILE)
+    added = fold_samples(state, paths)
+    if added:
+        monthly_state.save_state(STATE_FILE, state)
+        log(f"Folded {added} new sample file(s) into {STATE_FILE}")
+    if not state["counts"]:
         log("No commit timestamps found. Exiting.")
         return
-    plot_over_time(timestamps)
+    plot_over_time(state)
     log("Done.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,143 @@
+#Joins a commit->entity relation with c2dat on the commit so per-project or
+#per-author metrics over time come out of a single pass, e.g.
+#  python analyze_joined_over_time.py --relation c2P ../sampling/sample/c2PSampleU.s.gz
+#  python analyze_joined_over_time.py --relation p2c ../sampling/commits/project_commits.tsv
+#  python analyze_joined_over_time.py --relation a2c ../sampling/commits/author_commits.tsv
+#Months are folded into ~/joined_<entity>_over_time_state.npz; relation files
+#already folded into it are skipped, so new shards can be added run by run.
+#Fold only disjoint shards: overlapping files count their shared commits twice.
+#Commits-per-entity stats cover the relation files joined in that run.
+
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from woclib import monthly_state, stratified
+from woclib.common import HOME, log, pyplot, safe_savefig, compute_and_save_stats
+from woclib.hashjoin import hash_join, DEFAULT_MEMORY_BUDGET
+
+C2DAT_PATH = "../sampling/sample/c2datSampleU.s.gz"
+
+# relation -> (entity label, commit column, entity column)
+RELATIONS = {
+    "c2P": ("Project", 0, 1),
+    "p2c": ("Project", 1, 0),
+    "A2c": ("Author", 1, 0),
+    "a2c": ("Author", 1, 0),
+}
+
+def state_path(label):
+    return os.path.join(HOME, f"joined_{label.lower()}_over_time_state.npz")
+
+def aggregate_joined(rows, entity_col, year_weights=None, flush_every=1_000_000, state=None):
+    """Fold joined (commit, entity_fields, c2dat_fields) rows into a monthly
+    state of commits and distinct active entities (a new one unless `state`
+    is given), and count commits per entity. `year_weights` (from a
+    stratified c2dat sample) weights the monthly commit counts; distinct
+    counts and commits per entity stay unweighted."""
+    def fold(timestamps, entities):
+        weights = None
+        if year_weights and timestamps:
+            weights = stratified.weights_for_timestamps(timestamps, year_weights)
+        monthly_state.fold_distinct(state, timestamps, entities, weights)
+
+    if state is None:
+        state = monthly_state.new_state(distinct=True)
+    monthly_state.check_weighting(state, bool(year_weights), "joined c2dat rows")
+    per_entity = Counter()
+    timestamps, entities = [], []
+    for _, ent_fields, dat_fields in rows:
+        if len(ent_fields) <= entity_col or len(dat_fields) < 2:
+            continue
+        try:
+            ts = int(dat_fields[1])
+        except ValueError:
+            continue
+        entity = ent_fields[entity_col]
+        per_entity[entity] += 1
+        timestamps.append(ts)
+        entities.append(entity)
+        if len(timestamps) >= flush_every:
+            fold(timestamps, entities)
+            timestamps, entities = [], []
+    fold(timestamps, entities)
+    return state, per_entity
+
+def plot_joined(state, label):
+    import pandas as pd
+    plt = pyplot()
+    months, active, _ = monthly_state.monthly_distinct(state, 2005, 2021)
+    _, commits = monthly_state.monthly_counts(state, 2005, 2021)
+    if not commits.any():
+        log("No joined commits in 2005–2021 — skipping plots.")
+        return
+    index = pd.DatetimeIndex(monthly_state.month_end_index(months), name="date")
+    stem = label.lower()
+
+    plt.figure(figsize=(12,6))
+    pd.Series(commits, index=index).plot(title=f"Commits with a Known {label} per Month (2005–2021)")
+    plt.ylabel("Commits")
+    safe_savefig(f"joined_{stem}_commits_per_month.png")
+
+    plt.figure(figsize=(12,6))
+    pd.Series(active, index=index).plot(title=f"Active {label}s per Month (2005–2021)")
+    plt.ylabel(f"Distinct {stem}s")
+    safe_savefig(f"joined_active_{stem}s_per_month.png")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Join a commit relation with c2dat and aggregate over time.")
+    ap.add_argument("relation_files", nargs="+",
+                    help="relation files (disjoint shards); ones already in the state are skipped")
+    ap.add_argument("--relation", choices=sorted(RELATIONS), default="c2P")
+    ap.add_argument("--c2dat", default=C2DAT_PATH)
+    ap.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_BUDGET >> 20)
+    ap.add_argument("--tmpdir", default=None)
+    args = ap.parse_args(argv)
+
+    label, commit_col, entity_col = RELATIONS[args.relation]
+    year_weights = None
+    weights_path = stratified.weights_path_for(args.c2dat)
+    if os.path.exists(weights_path):
+        log(f"Applying stratum weights from {weights_path}")
+        year_weights = stratified.load_weights(weights_path)
+    state_file = state_path(label)
+    state = monthly_state.load_state(state_file, distinct=True)
+    per_entity = Counter()
+    added = 0
+    for path in args.relation_files:
+        if not os.path.exists(path):
+            log(f"Relation file not found: {path}")
+            continue
+        if monthly_state.already_folded(state, path):
+            log(f"Already folded, skipping: {path}")
+            continue
+        log(f"Joining {path} with {args.c2dat} on commit ...")
+        rows = hash_join(path, args.c2dat, left_key=commit_col, right_key=0,
+                         memory_budget=args.memory_mb << 20, tmpdir=args.tmpdir)
+        try:
+            _, counts = aggregate_joined(rows, entity_col, year_weights, state=state)
+        except ValueError as e:
+            log(f"Skipping {e}")
+            continue
+        per_entity.update(counts)
+        monthly_state.mark_folded(state, path)
+        added += 1
+    if added:
+        monthly_state.save_state(state_file, state)
+        log(f"Folded {added} new relation file(s) into {state_file}")
+    if not state["counts"]:
+        log("Join produced no rows. Exiting.")
+        return
+
+    if per_entity:
+        log(f"Joined {sum(per_entity.values())} commits across {len(per_entity)} {label.lower()}s.")
+        compute_and_save_stats(list(per_entity.values()), f"Joined Commits per {label}",
+                               f"joined_commits_per_{label.lower()}_stats.txt")
+    plot_joined(state, label)
+    log("Done.")
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,12 @@ OUTFILE="$OUTDIR/size_metrics.txt"
 # During the running of this file da3 was down and attempting to iterate through da3_data was causing crashes.
 SERVERS="da0 da1 da2 da4 da5"
 
+# Distinct counts use the external parallel sort -u in woclib (same counts as
+# `sort -u`, far less temp space at full-relation scale).
+export PYTHONPATH="$(cd "$(dirname "$0")/.." && pwd)${PYTHONPATH:+:$PYTHONPATH}"
+SORT_TMP=${SORT_TMP:-$OUTDIR/tmp}
+mkdir -p "$SORT_TMP"
+
 exec >"$OUTFILE"
 
 stream_relation() {
@@ -34,7 +40,7 @@ log "Counting unique projects..."
 echo "[2] Number of unique projects (c2P):"
 stream_relation c2P \
   | awk 'NR % 10000000 == 0 {print NR, "lines processed for projects" > "/dev/stderr"; fflush("/dev/stderr")} {print}' \
-  | cut -d';' -f2 | sort -u | wc -l
+  | python3 -m woclib.extsort -f 2 -T "$SORT_TMP" - | wc -l
 echo
 
 # 3. Number of uniqued aliased authors
@@ -42,5 +48,5 @@ log "Counting unique authors..."
 echo "[3] Number of unique authors (A2c):"
 stream_relation A2c \
   | awk 'NR % 10000000 == 0 {print NR, "lines processed for authors" > "/dev/stderr"; fflush("/dev/stderr")} {print}' \
-  | cut -d';' -f1 | sort -u | wc -l
+  | python3 -m woclib.extsort -f 1 -T "$SORT_TMP" - | wc -l
 echo
\ No newline at end of file
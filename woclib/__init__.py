@@ -0,0 +1 @@
+"""Shared building blocks for the WoC sampling and size-metric analyses."""
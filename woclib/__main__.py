@@ -0,0 +1,5 @@
+import sys
+
+from woclib.cli import main
+
+sys.exit(main())
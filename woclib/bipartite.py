@@ -0,0 +1,167 @@
+"""Author-project bipartite graph in CSR form.
+
+Left nodes (authors) and right nodes (projects) are interned to dense
+integers. Edges are held as `indptr`/`indices` NumPy arrays, as in
+scipy.sparse, so a2p results with millions of edges take two int arrays
+rather than a dict of string sets. `transpose` gives the p2a view. Degree
+distributions come from `np.diff` and `np.bincount`. The co-authorship
+projection and connected components go through scipy.sparse, which is
+imported on first use.
+"""
+import os
+
+import numpy as np
+
+from woclib.common import HOME, log, compute_and_save_stats
+
+
+class Bipartite:
+    """CSR adjacency from left nodes to right nodes."""
+
+    __slots__ = ("left_names", "right_names", "indptr", "indices")
+
+    def __init__(self, left_names, right_names, indptr, indices):
+        self.left_names = left_names
+        self.right_names = right_names
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, left, right, left_names, right_names):
+        """Build from parallel integer edge arrays; duplicate edges are dropped."""
+        n_left, n_right = len(left_names), len(right_names)
+        code = np.unique(np.asarray(left, dtype=np.int64) * max(n_right, 1) +
+                         np.asarray(right, dtype=np.int64))
+        rows = code // max(n_right, 1)
+        indices = (code % max(n_right, 1)).astype(np.int32)
+        indptr = np.zeros(n_left + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_left), out=indptr[1:])
+        return cls(list(left_names), list(right_names), indptr, indices)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build from (left name, right name) string pairs."""
+        left_index, right_index = {}, {}
+        left, right = [], []
+        for a, b in pairs:
+            left.append(left_index.setdefault(a, len(left_index)))
+            right.append(right_index.setdefault(b, len(right_index)))
+        return cls.from_edges(left, right, list(left_index), list(right_index))
+
+    @classmethod
+    def concat(cls, graphs):
+        """Union of several graphs, re-interning names on both sides."""
+        left_index, right_index = {}, {}
+        lefts, rights = [], []
+        for g in graphs:
+            lmap = np.array([left_index.setdefault(n, len(left_index)) for n in g.left_names],
+                            dtype=np.int64)
+            rmap = np.array([right_index.setdefault(n, len(right_index)) for n in g.right_names],
+                            dtype=np.int64)
+            lefts.append(lmap[g.edge_rows()] if g.n_edges else np.zeros(0, dtype=np.int64))
+            rights.append(rmap[g.indices] if g.n_edges else np.zeros(0, dtype=np.int64))
+        if not lefts:
+            return cls.from_edges([], [], [], [])
+        return cls.from_edges(np.concatenate(lefts), np.concatenate(rights),
+                              list(left_index), list(right_index))
+
+    @property
+    def n_left(self):
+        return len(self.left_names)
+
+    @property
+    def n_right(self):
+        return len(self.right_names)
+
+    @property
+    def n_edges(self):
+        return int(self.indices.size)
+
+    def __len__(self):
+        return self.n_left
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes
+
+    def edge_rows(self):
+        """Left index of every edge, aligned with `indices`."""
+        return np.repeat(np.arange(self.n_left, dtype=np.int64), self.left_degrees())
+
+    def left_degrees(self):
+        return np.diff(self.indptr)
+
+    def right_degrees(self):
+        return np.bincount(self.indices, minlength=self.n_right)
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def transpose(self):
+        """The same graph seen from the right side (a2p -> p2a)."""
+        return Bipartite.from_edges(self.indices, self.edge_rows(), self.right_names, self.left_names)
+
+    def to_sparse(self, edge_mask=None):
+        from scipy.sparse import csr_matrix
+        data = np.ones(self.n_edges, dtype=np.int32) if edge_mask is None else edge_mask.astype(np.int32)
+        return csr_matrix((data, self.indices, self.indptr), shape=(self.n_left, self.n_right))
+
+    def projection(self, max_degree=None):
+        """Left-left matrix counting shared right nodes (co-authorship for a2p),
+        diagonal removed. Right nodes with more than `max_degree` neighbours are
+        left out, since each adds degree^2 entries."""
+        mask = None
+        if max_degree is not None:
+            mask = (self.right_degrees() <= max_degree)[self.indices]
+        m = self.to_sparse(mask)
+        proj = (m @ m.T).tocsr()
+        proj.setdiag(0)
+        proj.eliminate_zeros()
+        return proj
+
+    def components(self):
+        """(n, left labels, right labels) of the connected components."""
+        from scipy.sparse import bmat
+        from scipy.sparse.csgraph import connected_components
+        m = self.to_sparse()
+        adj = bmat([[None, m], [m.T, None]], format="csr")
+        n, labels = connected_components(adj, directed=False)
+        return n, labels[:self.n_left], labels[self.n_left:]
+
+
+def _write_degrees(graph, outpath):
+    with open(outpath, "w") as f:
+        f.write("side\tdegree\tnodes\n")
+        for side, deg in (("left", graph.left_degrees()), ("right", graph.right_degrees())):
+            hist = np.bincount(deg)
+            for d in np.flatnonzero(hist).tolist():
+                f.write(f"{side}\t{d}\t{hist[d]}\n")
+
+
+def write_graph_report(graph, label, stem, max_degree=1000):
+    """Degree distributions of both sides to ~/<stem>_degrees.tsv, and the
+    right-side degree stats plus graph size, components and projection
+    summary to ~/<stem>_graph_stats.txt."""
+    log(f"{label}: {graph.n_left} x {graph.n_right} nodes, {graph.n_edges} edges "
+        f"({graph.nbytes() / 1e6:.1f} MB CSR)")
+    outpath = os.path.join(HOME, f"{stem}_degrees.tsv")
+    _write_degrees(graph, outpath)
+    log(f"{label} degree distributions written to {outpath}")
+
+    n_comp, left_labels, right_labels = graph.components()
+    comp_sizes = np.bincount(np.concatenate([left_labels, right_labels]), minlength=n_comp)
+    proj = graph.projection(max_degree)
+    co_degrees = np.diff(proj.indptr)
+    extra = {
+        "left_nodes": graph.n_left,
+        "right_nodes": graph.n_right,
+        "edges": graph.n_edges,
+        "components": int(n_comp),
+        "largest_component": int(comp_sizes.max()) if comp_sizes.size else 0,
+        "largest_component_share": float(comp_sizes.max() / comp_sizes.sum()) if comp_sizes.size else 0.0,
+        "projection_max_degree": max_degree,
+        "projection_pairs": int(proj.nnz // 2),
+        "projection_mean_degree": float(co_degrees.mean()) if co_degrees.size else 0.0,
+        "projection_isolated": int((co_degrees == 0).sum()),
+    }
+    return compute_and_save_stats(graph.right_degrees(), label, f"{stem}_graph_stats.txt",
+                                  extra=extra, extremes=True)
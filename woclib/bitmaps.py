@@ -0,0 +1,287 @@
+"""Roaring-style compressed bitmaps over interned integer ids.
+
+An id set is split by its high bits (id >> 16) into chunks of 65536 ids.
+Each chunk is stored in a container. A sparse chunk is a sorted uint16
+array of the low bits. A chunk with more than ARRAY_MAX members is a
+1024-word bitset. Commit handles from woclib.shaid and author indices fit
+this directly.
+
+`BitmapIndex` holds one bitmap per named set (e.g. commits or authors per
+project). It answers pairwise and top-k overlap queries, skipping sets that
+share no chunk with the query. `all_pairs` counts every overlapping pair at
+once by inverting the containers chunk by chunk. An id held by d sets adds
+d * (d - 1) / 2 pair entries, so the work grows with the sum of d^2 over
+shared ids. One commit carried by 10k forks alone gives 5e7 pairs, so ids
+held by more than `max_degree` sets are skipped and counted.
+"""
+import os
+
+import numpy as np
+
+from woclib.common import HOME, log, compute_and_save_stats
+
+ARRAY_MAX = 4096
+CHUNK_BITS = 16
+
+
+def _popcount(words):
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(words).sum())
+    return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def _to_bitset(low):
+    bits = np.zeros(1 << CHUNK_BITS, dtype=bool)
+    bits[low] = True
+    return np.packbits(bits, bitorder="little").view("<u8")
+
+
+def _to_low(container):
+    if container.dtype == np.uint16:
+        return container
+    bits = np.unpackbits(container.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def _make_container(low):
+    return low if low.size <= ARRAY_MAX else _to_bitset(low)
+
+
+def _and_count(a, b):
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        return int(np.intersect1d(a, b, assume_unique=True).size)
+    if a.dtype == np.uint16:
+        a, b = b, a
+    if b.dtype == np.uint16:
+        return int(((a[b >> 6] >> (b & 63).astype(np.uint64)) & np.uint64(1)).sum())
+    return _popcount(a & b)
+
+
+class Bitmap:
+    """Immutable compressed set of non-negative integers."""
+
+    __slots__ = ("keys", "containers", "_card")
+
+    def __init__(self, keys, containers):
+        self.keys = keys
+        self.containers = containers
+        self._card = None
+
+    @classmethod
+    def from_ids(cls, ids):
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if ids.size and ids[0] < 0:
+            raise ValueError("bitmap ids must be non-negative")
+        high = ids >> CHUNK_BITS
+        keys, starts = np.unique(high, return_index=True)
+        parts = np.split((ids & 0xFFFF).astype(np.uint16), starts[1:]) if ids.size else []
+        return cls(keys, [_make_container(p) for p in parts])
+
+    def __len__(self):
+        if self._card is None:
+            self._card = sum(c.size if c.dtype == np.uint16 else _popcount(c)
+                             for c in self.containers)
+        return self._card
+
+    def __contains__(self, x):
+        i = np.searchsorted(self.keys, x >> CHUNK_BITS)
+        if i == self.keys.size or self.keys[i] != x >> CHUNK_BITS:
+            return False
+        c = self.containers[i]
+        low = x & 0xFFFF
+        if c.dtype == np.uint16:
+            j = np.searchsorted(c, low)
+            return bool(j < c.size and c[j] == low)
+        return bool((int(c[low >> 6]) >> (low & 63)) & 1)
+
+    def to_array(self):
+        if not self.containers:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([(k << CHUNK_BITS) + _to_low(c).astype(np.int64)
+                               for k, c in zip(self.keys.tolist(), self.containers)])
+
+    def nbytes(self):
+        return self.keys.nbytes + sum(c.nbytes for c in self.containers)
+
+    def _shared_keys(self, other):
+        _, ia, ib = np.intersect1d(self.keys, other.keys, assume_unique=True, return_indices=True)
+        return ia.tolist(), ib.tolist()
+
+    def intersection_size(self, other):
+        ia, ib = self._shared_keys(other)
+        return sum(_and_count(self.containers[i], other.containers[j]) for i, j in zip(ia, ib))
+
+    def __and__(self, other):
+        ia, ib = self._shared_keys(other)
+        keys, containers = [], []
+        for i, j in zip(ia, ib):
+            low = np.intersect1d(_to_low(self.containers[i]), _to_low(other.containers[j]),
+                                 assume_unique=True)
+            if low.size:
+                keys.append(self.keys[i])
+                containers.append(_make_container(low))
+        return Bitmap(np.array(keys, dtype=np.int64), containers)
+
+    def __or__(self, other):
+        return Bitmap.from_ids(np.concatenate([self.to_array(), other.to_array()]))
+
+    def jaccard(self, other):
+        shared = self.intersection_size(other)
+        union = len(self) + len(other) - shared
+        return shared / union if union else 0.0
+
+
+class BitmapIndex:
+    """Named bitmaps with overlap queries."""
+
+    def __init__(self):
+        self.names = []
+        self.bitmaps = []
+        self._pos = {}
+        self._postings = None  # chunk key -> array of set indices
+        self.skipped_ids = 0  # ids over max_degree in the last all_pairs call
+
+    def add(self, name, ids):
+        self._pos[name] = len(self.names)
+        self.names.append(name)
+        self.bitmaps.append(Bitmap.from_ids(ids))
+        self._postings = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def sizes(self):
+        return np.array([len(b) for b in self.bitmaps], dtype=np.int64)
+
+    def nbytes(self):
+        return sum(b.nbytes() for b in self.bitmaps)
+
+    def _build_postings(self):
+        if self._postings is None:
+            if not self.bitmaps:
+                self._postings = {}
+                return self._postings
+            owners = np.concatenate([np.full(b.keys.size, i, dtype=np.int64)
+                                     for i, b in enumerate(self.bitmaps)])
+            keys = np.concatenate([b.keys for b in self.bitmaps])
+            order = np.argsort(keys, kind="stable")
+            uniq, starts = np.unique(keys[order], return_index=True)
+            self._postings = dict(zip(uniq.tolist(), np.split(owners[order], starts[1:])))
+        return self._postings
+
+    def overlap(self, a, b):
+        return self.bitmaps[self._pos[a]].intersection_size(self.bitmaps[self._pos[b]])
+
+    def top_k(self, name, k=10):
+        """[(other name, shared, jaccard)] for the k sets sharing most ids with `name`."""
+        postings = self._build_postings()
+        qi = self._pos[name]
+        q = self.bitmaps[qi]
+        cands = np.unique(np.concatenate([postings[key] for key in q.keys.tolist()] or
+                                         [np.zeros(0, dtype=np.int64)]))
+        hits = []
+        for j in cands.tolist():
+            if j == qi:
+                continue
+            shared = q.intersection_size(self.bitmaps[j])
+            if shared:
+                union = len(q) + len(self.bitmaps[j]) - shared
+                hits.append((self.names[j], shared, shared / union))
+        hits.sort(key=lambda h: (-h[1], -h[2]))
+        return hits[:k]
+
+    def all_pairs(self, min_shared=1, max_degree=None):
+        """(i, j, shared) arrays over every pair of sets (i < j) with at least
+        `min_shared` common ids. Ids held by more than `max_degree` sets are
+        left out; their number is kept in `skipped_ids`."""
+        postings = self._build_postings()
+        n = len(self.names)
+        codes, counts = [], []
+        self.skipped_ids = 0
+        for key, owners in postings.items():
+            if owners.size < 2:
+                continue
+            lows = []
+            for o in owners.tolist():
+                b = self.bitmaps[o]
+                c = b.containers[int(np.searchsorted(b.keys, key))]
+                lows.append(_to_low(c))
+            low = np.concatenate(lows)
+            own = np.repeat(owners, [x.size for x in lows])
+            order = np.lexsort((own, low))
+            low, own = low[order], own[order]
+            _, starts, deg = np.unique(low, return_index=True, return_counts=True)
+            paired = deg > 1
+            if max_degree is not None:
+                heavy = deg > max_degree
+                self.skipped_ids += int(heavy.sum())
+                paired &= ~heavy
+            if not paired.any():
+                continue
+            # every (left, right) position pair inside a group of equal ids
+            ends = np.repeat(starts + deg, deg)
+            pos = np.flatnonzero(np.repeat(paired, deg))
+            per = ends[pos] - pos - 1
+            left = np.repeat(pos, per)
+            offs = np.arange(per.sum()) - np.repeat(np.cumsum(per) - per, per)
+            right = left + 1 + offs
+            pair = own[left] * n + own[right]
+            u, c = np.unique(pair, return_counts=True)
+            codes.append(u)
+            counts.append(c)
+        if not codes:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        u, inv = np.unique(np.concatenate(codes), return_inverse=True)
+        shared = np.bincount(inv, weights=np.concatenate(counts)).astype(np.int64)
+        keep = shared >= min_shared
+        u, shared = u[keep], shared[keep]
+        return u // n, u % n, shared
+
+
+def pair_similarity(index, i, j, shared):
+    """Jaccard and containment (shared / smaller set) for all_pairs output."""
+    sizes = index.sizes()
+    a, b = sizes[i], sizes[j]
+    union = a + b - shared
+    jaccard = np.where(union > 0, shared / np.maximum(union, 1), 0.0)
+    containment = shared / np.maximum(np.minimum(a, b), 1)
+    return jaccard, containment
+
+
+def write_overlap_report(index, label, stem, top_pairs=1000, fork_containment=0.5, max_degree=1000):
+    """Write the `top_pairs` most-shared pairs to ~/<stem>_pairs.tsv and, per
+    set, its best containment (the largest fraction of its members found in
+    one other set) as similarity stats to ~/<stem>_similarity_stats.txt.
+    Pairs at or above `fork_containment` are counted as fork-like. Ids held
+    by more than `max_degree` sets do not count towards any pair."""
+    i, j, shared = index.all_pairs(max_degree=max_degree)
+    jaccard, containment = pair_similarity(index, i, j, shared)
+    log(f"{label}: {len(shared)} overlapping pairs among {len(index)} sets "
+        f"({index.nbytes() / 1e6:.1f} MB of bitmaps); {index.skipped_ids} ids in more than "
+        f"{max_degree} sets skipped")
+
+    order = np.lexsort((-jaccard, -shared))[:top_pairs]
+    outpath = os.path.join(HOME, f"{stem}_pairs.tsv")
+    with open(outpath, "w") as f:
+        f.write("a\tb\tshared\tjaccard\tcontainment\n")
+        for k in order.tolist():
+            f.write(f"{index.names[i[k]]}\t{index.names[j[k]]}\t{shared[k]}\t"
+                    f"{jaccard[k]:.4f}\t{containment[k]:.4f}\n")
+    log(f"{label} top pairs written to {outpath}")
+
+    sizes = index.sizes()
+    best = np.zeros(len(index))
+    np.maximum.at(best, i, shared / np.maximum(sizes[i], 1))
+    np.maximum.at(best, j, shared / np.maximum(sizes[j], 1))
+    extra = {
+        "sets": len(index),
+        "overlapping_pairs": int(shared.size),
+        "pair_max_degree": max_degree,
+        "ids_over_max_degree": index.skipped_ids,
+        "sets_with_overlap": int((best > 0).sum()),
+        f"fork_pairs_containment_ge_{fork_containment}": int((containment >= fork_containment).sum()),
+        "mean_pair_jaccard": float(jaccard.mean()) if jaccard.size else 0.0,
+    }
+    return compute_and_save_stats(best, label, f"{stem}_similarity_stats.txt",
+                                  extra=extra, extremes=True)
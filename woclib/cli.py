@@ -0,0 +1,206 @@
+"""One entry point for every analysis script:
+
+    python -m woclib list
+    python -m woclib check
+    python -m woclib tokens --adaptive --precision 0.02
+    python -m woclib all --skip traceability
+    python -m woclib --here commits-per-author --adaptive
+    python -m woclib serve --preload commits-per-author
+    python -m woclib query stats commits-per-author
+
+Each stage is the existing script, loaded from its file and run with the
+remaining arguments from its own directory, since the scripts use paths
+relative to it (`--here` keeps the current one). `all` runs the stages one
+after another in this process, so imports, the memoized sample loaders and
+lookups from woclib.common, and the shared SHA1 stores are paid for once.
+`serve` keeps that state alive between questions (see woclib.server), and
+`query` is its client.
+"""
+import argparse
+import contextlib
+import base64
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from woclib.common import log
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# stage -> (script path relative to the repo root, runs in `all`)
+STAGES = {
+    "commits-over-time": ("size_metrics/analyze_commits_over_time.py", True),
+    "blobs-over-time": ("size_metrics/analyze_blobs_over_time.py", True),
+    "joined-over-time": ("size_metrics/analyze_joined_over_time.py", False),  # needs a relation file
+    "blob-sizes": ("sampling/blobs/analyze_blob_sizes.py", True),
+    "commits-per-author": ("sampling/commits/analyze_commits_per_author.py", True),
+    "commits-per-project": ("sampling/commits/analyze_commits_per_project.py", True),
+    "projects-per-author": ("sampling/projects/analyze_projects_per_author.py", True),
+    "tokens": ("sampling/tokens/analyze_tokens.py", True),
+    "traceability": ("sampling/traceability/analyze_traceabiliy.py", True),
+}
+
+
+
+def load_stage(name):
+    """Import a stage's script as woclib.stages.<script name> (once per process)."""
+    stem = os.path.splitext(os.path.basename(STAGES[name][0]))[0]
+    return importlib.import_module(f"woclib.stages.{stem}")
+
+
+@contextlib.contextmanager
+def _in_dir(path):
+    prev = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(prev)
+
+
+def run_stage(name, argv=(), here=False):
+    mod = load_stage(name)
+    workdir = os.getcwd() if here else os.path.dirname(os.path.join(REPO_ROOT, STAGES[name][0]))
+    start = time.time()
+    with _in_dir(workdir):
+        mod.main(list(argv))
+    log(f"Stage {name} finished in {time.time() - start:.1f}s")
+
+
+def run_all(stages, keep_going=False, here=False):
+    failed = []
+    for name in stages:
+        log(f"=== {name} ===")
+        try:
+            run_stage(name, here=here)
+        except Exception as e:
+            if not keep_going:
+                raise
+            log(f"Stage {name} failed: {e!r}")
+            failed.append(name)
+    if failed:
+        log(f"Failed stages: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+def check_stages(workers=2, blobs=40):
+    """Import every stage and run traceability's shard mappers in worker
+    processes, under each available start method. The workers must import
+    the stage module again to unpickle its functions."""
+    for name in STAGES:
+        load_stage(name)
+    mod = load_stage("traceability")
+    failed = []
+    with tempfile.TemporaryDirectory(prefix="woclib_check_") as work:
+        content, files = os.path.join(work, "content.txt"), os.path.join(work, "b2f.tsv")
+        with open(content, "w") as c, open(files, "w") as f:
+            for i in range(blobs):
+                blob = f"{i:040x}"
+                text = base64.b64encode(f"def f{i}(x):\n    return x + {i}\n".encode()).decode()
+                c.write(f"{blob};{text}\n")
+                f.write(f"{blob};src/f{i}.py\n{blob};web/f{i}.js\n")
+        for method in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context(method)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                parts = list(pool.map(mod.map_content_shard, [
+                    (content, start, end, os.path.join(work, f"{method}_{i}.tsv"), frozenset())
+                    for i, (start, end) in enumerate(mod.split_ranges(content, workers * 2))]))
+                multi = sum(pool.map(mod.map_files_shard, [
+                    (files, start, end, frozenset())
+                    for start, end in mod.split_ranges(files, workers * 2, key_aligned=True)]))
+            textlike = sum(p["textlike"] for p in parts)
+            ok = textlike == blobs and multi == blobs
+            log(f"check ({method}): {textlike}/{blobs} text blobs, {multi}/{blobs} multi-language "
+                f"-> {'ok' if ok else 'FAILED'}")
+            if not ok:
+                failed.append(method)
+    return 1 if failed else 0
+
+
+def _stage_list(text):
+    names = [n for n in text.split(",") if n]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(unknown)}")
+    return names
+
+
+def _dataset_list(text):
+    from woclib.server import DATASETS
+    names = [n for n in text.split(",") if n]
+    unknown = [n for n in names if n not in DATASETS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown dataset(s): {', '.join(unknown)}")
+    return names
+
+
+def run_query(args):
+    from woclib.server import query
+    params = {"dataset": args.dataset, "k": args.k, "bins": args.bins, "key": args.key,
+              "ci": args.ci, "log": 1 if args.log else None}
+    status, body = query(args.query, params, args.port, args.socket)
+    if isinstance(body, str):
+        print(f"HTTP {status}: {body}" if status != 200 else body)
+    else:
+        print(json.dumps(body, indent=2))
+    return 0 if status == 200 else 1
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    here = False
+    if argv[:1] == ["--here"]:
+        here, argv = True, argv[1:]
+    if argv and argv[0] in STAGES:
+        # everything after the stage name belongs to the stage's own parser
+        run_stage(argv[0], argv[1:], here)
+        return 0
+
+    ap = argparse.ArgumentParser(
+        prog="python -m woclib", description="Run WoC analyses.",
+        usage="python -m woclib [--here] {list,check,all,serve,query,STAGE} [args ...]",
+        epilog="stages: " + ", ".join(STAGES))
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list stages")
+    sub.add_parser("check", help="import every stage and run a sharded stage in worker processes")
+    p_all = sub.add_parser("all", help="run several stages in one process")
+    p_all.add_argument("--only", type=_stage_list, default=None, help="comma-separated stages")
+    p_all.add_argument("--skip", type=_stage_list, default=[], help="comma-separated stages")
+    p_all.add_argument("--keep-going", action="store_true", help="continue after a failing stage")
+    from woclib.server import DATASETS, PORT, QUERIES
+    p_serve = sub.add_parser("serve", help="keep datasets in memory and answer queries")
+    p_query = sub.add_parser("query", help="ask a running server")
+    for p in (p_serve, p_query):
+        p.add_argument("--port", type=int, default=PORT)
+        p.add_argument("--socket", default=None, help="Unix socket path instead of 127.0.0.1:PORT")
+    p_serve.add_argument("--preload", type=_dataset_list, default=[],
+                         help="comma-separated datasets to load before serving")
+    p_query.add_argument("query", choices=["datasets", "reload", *QUERIES])
+    p_query.add_argument("dataset", nargs="?", choices=list(DATASETS))
+    p_query.add_argument("-k", type=int, default=None, help="topk/overlap: number of results")
+    p_query.add_argument("--bins", type=int, default=None, help="hist: number of bins")
+    p_query.add_argument("--log", action="store_true", help="hist: log-spaced bins")
+    p_query.add_argument("--key", default=None, help="overlap: project to compare")
+    p_query.add_argument("--ci", type=int, default=None, help="stats: bootstrap replicates")
+    args = ap.parse_args(argv)
+
+    if args.command == "list":
+        for name, (path, in_all) in STAGES.items():
+            print(f"{name:22s} {path}{'' if in_all else '  (not in all)'}")
+        return 0
+    if args.command == "check":
+        return check_stages()
+    if args.command == "serve":
+        from woclib.server import serve
+        serve(args.port, args.socket, args.preload, os.getcwd() if here else None)
+        return 0
+    if args.command == "query":
+        return run_query(args)
+    stages = args.only or [n for n, (_, in_all) in STAGES.items() if in_all]
+    stages = [n for n in stages if n not in args.skip]
+    return run_all(stages, args.keep_going, here)
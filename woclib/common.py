@@ -0,0 +1,176 @@
+"""Helpers shared by the analysis scripts: logging, figure saving, batching,
+summary statistics, and a per-process cache for loaded samples and lookups.
+
+matplotlib and scipy are imported on first use, so a stage that never plots
+or computes moments does not pay their import cost. When several stages run
+in one process (`python -m woclib all`), loaders wrapped in `memoized` read
+each input and run each lookup only once.
+"""
+import functools
+import os
+
+import numpy as np
+
+HOME = os.path.expanduser("~")
+
+_CACHE = {}
+_STORES = {}
+
+
+def log(msg):
+    print(f"[INFO] {msg}", flush=True)
+
+
+def pyplot():
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def safe_savefig(name):
+    plt = pyplot()
+    out = os.path.join(HOME, name)
+    plt.savefig(out, bbox_inches="tight")
+    log(f"[SAVED] {out}")
+    plt.close()
+
+
+def batched(iterable, n):
+    buf = []
+    for x in iterable:
+        buf.append(x)
+        if len(buf) >= n:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def summary_stats(values, weights=None, extremes=False):
+    """count/mean/median/std/var/skew/kurtosis/quartiles (bias-corrected, as in
+    scipy with bias=False); weighted via woclib.stratified when weights are given."""
+    values = np.asarray(values, dtype=float)
+    if weights is not None and values.size:
+        from woclib.stratified import weighted_stats
+        stats = weighted_stats(values, weights)
+    elif values.size == 0:
+        stats = {
+            "count": 0, "mean": 0, "median": 0, "std": 0, "var": 0,
+            "skew": 0, "kurtosis": 0, "q1": 0, "q2": 0, "q3": 0
+        }
+    else:
+        from scipy.stats import skew, kurtosis
+        stats = {
+            "count": int(values.size),
+            "mean": float(np.mean(values)),
+            "median": float(np.median(values)),
+            "std": float(np.std(values, ddof=1)) if values.size > 1 else 0.0,
+            "var": float(np.var(values, ddof=1)) if values.size > 1 else 0.0,
+            "skew": float(skew(values, bias=False)) if values.size > 1 else 0.0,
+            "kurtosis": float(kurtosis(values, bias=False)) if values.size > 1 else 0.0,
+            "q1": float(np.percentile(values, 25)),
+            "q2": float(np.percentile(values, 50)),
+            "q3": float(np.percentile(values, 75)),
+        }
+    if extremes:
+        stats["min"] = float(np.min(values)) if values.size else 0
+        stats["max"] = float(np.max(values)) if values.size else 0
+    return stats
+
+
+def compute_and_save_stats(values, label, outfile, weights=None, extra=None, extremes=False):
+    """Write `key: value` summary lines to ~/outfile; `extra` entries are appended."""
+    stats = summary_stats(values, weights, extremes)
+    stats.update(extra or {})
+    outpath = os.path.join(HOME, outfile)
+    with open(outpath, "w") as f:
+        for k, v in stats.items():
+            f.write(f"{k}: {v}\n")
+    log(f"{label} stats written to {outpath}")
+    return stats
+
+
+def compute_and_save_ci(values, stats, label, outfile, reps=2000, alpha=0.05, workers=0,
+                        weights=None):
+    """Bootstrap CIs for the headline stats, written alongside the stats file."""
+    from woclib.bootstrap import bootstrap_ci, write_ci_file
+    cis = bootstrap_ci(values, reps=reps, alpha=alpha, workers=workers, weights=weights)
+    outpath = os.path.join(HOME, outfile)
+    write_ci_file(cis, stats, outpath, reps, alpha)
+    log(f"{label} bootstrap CIs written to {outpath}")
+    return cis
+
+
+def sha1_mask(ids, noun="ids"):
+    """Boolean mask of the well-formed SHA1s in `ids`; the rest (truncated or
+    non-hex lines in a lookup reply or sample) are logged so they can be
+    skipped instead of failing the whole intern_many batch."""
+    from woclib.shaid import valid_mask
+    mask = valid_mask(ids)
+    if not mask.all():
+        bad = [i for i, ok in zip(ids, mask.tolist()) if not ok]
+        log(f"Skipping {len(bad)} malformed {noun} (not 40-character hex), e.g. {bad[:3]!r}")
+    return mask
+
+
+def shared_store(name):
+    """Process-wide ShaStore per id kind ("commits", "blobs"), so memoized
+    lookups that return handles stay valid across stages."""
+    store = _STORES.get(name)
+    if store is None:
+        from woclib.shaid import ShaStore
+        store = _STORES[name] = ShaStore()
+    return store
+
+
+def _cache_key(arg, top=True):
+    if top and isinstance(arg, str) and os.path.isfile(arg):
+        # inputs are identified by real path and mtime, not by how a stage spells them
+        return ("file", os.path.realpath(arg), os.stat(arg).st_mtime_ns)
+    if isinstance(arg, (list, tuple)):
+        return tuple(_cache_key(a, False) for a in arg)
+    try:
+        hash(arg)
+    except TypeError:
+        return ("id", id(arg))
+    return arg
+
+
+def memoized(fn):
+    """Cache a loader's result for the life of the process, keyed on its
+    arguments (files by path and mtime, unhashable objects by identity)."""
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (name, tuple(_cache_key(a) for a in args),
+               tuple((k, _cache_key(v)) for k, v in sorted(kwargs.items())))
+        if key not in _CACHE:
+            _CACHE[key] = fn(*args, **kwargs)
+        return _CACHE[key]
+
+    return wrapper
+
+
+def clear_cache():
+    _CACHE.clear()
+    _STORES.clear()
+
+
+@memoized
+def read_sampled_keys(tsv_path, step, noun="keys"):
+    """Deterministically sample every 1/step key from the TSV's first column."""
+    seen = set()
+    sampled = []
+    with open(tsv_path, "r", errors="ignore") as f:
+        for idx, line in enumerate(f):
+            if idx % step != 0:
+                continue
+            parts = line.strip().split(";")
+            if not parts:
+                continue
+            key = parts[0]
+            if key and key not in seen:
+                seen.add(key)
+                sampled.append(key)
+    log(f"From {tsv_path}: sampled {len(sampled)} unique {noun} (every 1/{step} rows).")
+    return sampled
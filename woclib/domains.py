@@ -0,0 +1,139 @@
+"""URL host normalization and registrable-domain / internal-domain classification.
+
+Hosts are lowercased and stripped of userinfo, port and trailing dots;
+non-ASCII hosts are IDNA-encoded, so `bücher.de` and `xn--bcher-kva.de` are
+one host. Each host is then walked right-to-left through a trie of reversed
+labels. The walk finds the longest known public suffix (so `a.b.co.uk` ->
+`b.co.uk`, `x.github.io` -> `github.io`) and, in the same pass, whether the
+host sits under an internal (code-hosting) domain. Results are cached per
+host since URLs in source code repeat the same few hosts endlessly.
+"""
+import re
+
+# Multi-label public suffixes; any other host falls back to its last label as
+# the suffix. Hosting platforms such as github.io are deliberately absent so
+# their per-user subdomains collapse into one domain.
+MULTI_LABEL_SUFFIXES = (
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "net.uk", "ltd.uk", "plc.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au", "asn.au", "id.au",
+    "co.nz", "org.nz", "net.nz", "ac.nz", "govt.nz",
+    "co.jp", "ne.jp", "or.jp", "ac.jp", "go.jp", "gr.jp",
+    "co.kr", "or.kr", "ac.kr", "go.kr", "ne.kr",
+    "com.cn", "net.cn", "org.cn", "edu.cn", "gov.cn", "ac.cn",
+    "com.tw", "org.tw", "edu.tw", "gov.tw", "net.tw",
+    "com.hk", "org.hk", "edu.hk", "gov.hk", "net.hk",
+    "com.sg", "org.sg", "edu.sg", "gov.sg", "net.sg",
+    "co.in", "net.in", "org.in", "ac.in", "gov.in", "res.in",
+    "com.br", "org.br", "net.br", "gov.br", "edu.br",
+    "com.ar", "org.ar", "gob.ar", "edu.ar",
+    "com.mx", "org.mx", "gob.mx", "edu.mx",
+    "co.za", "org.za", "ac.za", "gov.za",
+    "com.tr", "org.tr", "edu.tr", "gov.tr",
+    "com.ru", "org.ru", "net.ru", "msk.ru", "spb.ru",
+    "com.ua", "org.ua", "net.ua", "gov.ua", "in.ua",
+    "co.il", "org.il", "ac.il", "gov.il",
+    "com.pl", "org.pl", "net.pl", "edu.pl",
+    "co.id", "or.id", "ac.id", "go.id",
+    "com.my", "org.my", "edu.my", "gov.my",
+    "com.vn", "edu.vn", "gov.vn",
+    "com.es", "org.es", "nom.es",
+    "co.at", "or.at", "ac.at",
+    "com.co", "gov.co", "edu.co",
+)
+
+HOST_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*://(?:[^@/?#\s]*@)?(\[[^\]]*\]|[^/?#:\s]*)")
+IPV4_RE = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+CACHE_LIMIT = 1 << 20
+
+_SUFFIX = "\x00suffix"
+_INTERNAL = "\x00internal"
+
+
+def normalize_host(url):
+    """Lowercased (IDNA-encoded if non-ASCII) host of a URL without userinfo,
+    port or trailing dots; None if absent."""
+    m = HOST_RE.match(url)
+    if not m:
+        return None
+    host = m.group(1).lower()
+    if host.startswith("["):
+        return host
+    if not host.isascii():
+        try:
+            host = host.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass  # not a valid IDN; keep the lowercased text
+    return host.strip(".") or None
+
+
+class DomainClassifier:
+    """Maps URLs to (registrable domain, is_internal) with one trie walk per new host."""
+
+    def __init__(self, internal_domains, suffixes=MULTI_LABEL_SUFFIXES):
+        self._root = {}
+        for suffix in suffixes:
+            self._node(suffix)[_SUFFIX] = True
+        for dom in internal_domains:
+            # internal hosts are matched at the registrable level, so every
+            # host of an internal site (api., raw., gist., ...) is internal
+            reg = self._walk(dom.lower())[0]
+            self._node(reg)[_INTERNAL] = True
+        self._cache = {}
+
+    def _node(self, domain):
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        return node
+
+    def _walk(self, host):
+        labels = host.split(".")
+        node = self._root
+        suffix_len = 1
+        internal = False
+        depth = 0
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            depth += 1
+            if _SUFFIX in node:
+                suffix_len = depth
+            if _INTERNAL in node:
+                internal = True
+        if len(labels) <= suffix_len:
+            return host, internal
+        return ".".join(labels[-(suffix_len + 1):]), internal
+
+    def classify_host(self, host):
+        hit = self._cache.get(host)
+        if hit is not None:
+            return hit
+        if host.startswith("[") or IPV4_RE.match(host):
+            hit = (host, False)
+        else:
+            hit = self._walk(host)
+        if len(self._cache) >= CACHE_LIMIT:
+            self._cache.clear()
+        self._cache[host] = hit
+        return hit
+
+    def classify(self, url):
+        """(registrable domain, is_internal), or (None, False) for URLs without a host."""
+        host = normalize_host(url)
+        if host is None:
+            return None, False
+        return self.classify_host(host)
+
+    def classify_many(self, urls):
+        """Classify a batch, resolving each distinct host once."""
+        hosts = [normalize_host(u) for u in urls]
+        resolved = {h: self.classify_host(h) for h in set(hosts) if h is not None}
+        return [resolved[h] if h is not None else (None, False) for h in hosts]
+
+    def domain_of(self, url):
+        return self.classify(url)[0]
+
+    def is_internal_domain(self, domain):
+        """Internal class of an already-normalized registrable domain."""
+        return self.classify_host(domain)[1]
@@ -0,0 +1,246 @@
+"""External-memory parallel sort -u of one `;`-separated column.
+
+Replacement for `zcat rel.s.gz | cut -d';' -f2 | sort -u > keys.txt`:
+
+    python -m woclib.extsort -f 2 -o projects_u.txt ../c2PSampleU.s.gz
+
+Input is read in raw byte blocks and handed to worker processes. Each
+worker cuts its blocks and collects their distinct keys until its share of
+the memory budget is full, then sorts them into a gzip-compressed run, so a
+run deduplicates as much input as fits in memory. The runs are then k-way
+merged (in several passes if there are too many) with duplicates dropped on
+the fly. Keys are compared as bytes, i.e. the same order as
+`LC_ALL=C sort -u`.
+"""
+import argparse
+import gzip
+import heapq
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_MEMORY_BUDGET = 1 << 30  # bytes
+MIN_BLOCK = 1 << 20
+KEY_OVERHEAD = 100  # bytes a collected key costs beyond its length (bytes object, set slot, sort list)
+MERGE_FANIN = 64
+RUN_COMPRESSLEVEL = 1
+
+
+def log(msg):
+    print(f"[INFO] {msg}", file=sys.stderr, flush=True)
+
+
+def _open_input(path):
+    """Binary stream of a (possibly gzip'd) input; decompression runs in a
+    separate gzip/pigz process when one is available."""
+    if path == "-":
+        return sys.stdin.buffer, None
+    if path.endswith(".gz"):
+        tool = shutil.which("pigz") or shutil.which("gzip")
+        if tool:
+            proc = subprocess.Popen([tool, "-dc", path], stdout=subprocess.PIPE,
+                                    bufsize=1 << 20)
+            return proc.stdout, proc
+        return gzip.open(path, "rb"), None
+    return open(path, "rb"), None
+
+
+def iter_blocks(paths, block_bytes):
+    """Yield byte blocks that always end on a line boundary."""
+    for path in paths:
+        f, proc = _open_input(path)
+        try:
+            tail = b""
+            while True:
+                chunk = f.read(block_bytes)
+                if not chunk:
+                    break
+                chunk = tail + chunk
+                cut = chunk.rfind(b"\n")
+                if cut < 0:
+                    tail = chunk
+                    continue
+                tail = chunk[cut + 1:]
+                yield chunk[:cut + 1]
+            if tail:
+                yield tail + b"\n"
+        finally:
+            if f is not sys.stdin.buffer:
+                f.close()
+            if proc is not None:
+                proc.wait()
+
+
+def _block_keys(block, field, delim):
+    """Distinct `cut -d delim -f field+1` values of a newline-terminated block
+    (a line without the delimiter is taken whole, as cut does)."""
+    keys = set()
+    for line in block.split(b"\n")[:-1]:
+        parts = line.split(delim, field + 1)
+        if len(parts) == 1:
+            keys.add(line)
+        elif len(parts) > field:
+            keys.add(parts[field])
+        else:
+            keys.add(b"")
+    return keys
+
+
+def _write_run(keys, path):
+    with gzip.open(path, "wb", compresslevel=RUN_COMPRESSLEVEL) as out:
+        out.write(b"\n".join(keys))
+        out.write(b"\n")
+
+
+def _collect_runs(blocks, results, field, delim, key_budget, prefix):
+    """Worker loop: gather distinct keys from `blocks` until they take about
+    `key_budget` bytes, then write them as one sorted run. Puts the run paths
+    on `results` once `blocks` yields None."""
+    keys, key_bytes, runs = set(), 0, []
+
+    def flush():
+        path = f"{prefix}_{len(runs)}.gz"
+        _write_run(sorted(keys), path)
+        runs.append(path)
+
+    for block in iter(blocks.get, None):
+        new = _block_keys(block, field, delim)
+        before = len(keys)
+        keys.update(new)
+        # the keys that were new are costed at this block's mean key length
+        key_bytes += (len(keys) - before) * (KEY_OVERHEAD + sum(map(len, new)) / max(len(new), 1))
+        if key_bytes >= key_budget:
+            flush()
+            keys, key_bytes = set(), 0
+    if keys:
+        flush()
+    results.put(runs)
+
+
+def _check_alive(procs):
+    if any(p.exitcode not in (None, 0) for p in procs):
+        raise RuntimeError("a sort worker exited with an error")
+
+
+def _put(q, item, procs):
+    while True:
+        try:
+            return q.put(item, timeout=1)
+        except queue.Full:
+            _check_alive(procs)
+
+
+def _get(q, procs):
+    while True:
+        try:
+            return q.get(timeout=1)
+        except queue.Empty:
+            _check_alive(procs)
+
+
+def _read_run(path):
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            yield line
+
+
+def _run_key(line):
+    return line[:-1]
+
+
+def merge_unique(runs, out):
+    """k-way merge sorted runs into `out`, dropping duplicates; returns the key count.
+
+    Lines are compared without their newline, as the runs were sorted; keys
+    with bytes below b"\\n" would otherwise merge out of order."""
+    n = 0
+    last = None
+    for line in heapq.merge(*(_read_run(p) for p in runs), key=_run_key):
+        if line != last:
+            out.write(line)
+            last = line
+            n += 1
+    return n
+
+
+def _merge_to_run(runs, path):
+    with gzip.open(path, "wb", compresslevel=RUN_COMPRESSLEVEL) as out:
+        merge_unique(runs, out)
+    for p in runs:
+        os.remove(p)
+    return path
+
+
+def sort_unique(paths, out_path, field=1, delim=b";", memory_budget=DEFAULT_MEMORY_BUDGET,
+                workers=None, tmpdir=None):
+    """Write the sorted distinct values of 1-based column `field` to out_path
+    (`-` for stdout) and return how many there were."""
+    workers = workers or os.cpu_count() or 1
+    # half the budget is each worker's key set; the other half covers the
+    # queued blocks (held as bytes, a list of lines and a key set each)
+    key_budget = max(MIN_BLOCK, memory_budget // (workers * 2))
+    block_bytes = max(MIN_BLOCK, memory_budget // (workers * 3 * 2 * 6))
+    with tempfile.TemporaryDirectory(prefix="woc_sort_", dir=tmpdir) as work:
+        blocks = multiprocessing.Queue(maxsize=workers * 2)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=_collect_runs, daemon=True,
+                                         args=(blocks, results, field - 1, delim, key_budget,
+                                               os.path.join(work, f"run{w}")))
+                 for w in range(workers)]
+        for p in procs:
+            p.start()
+        try:
+            for block in iter_blocks(paths, block_bytes):
+                _put(blocks, block, procs)
+            for _ in procs:
+                _put(blocks, None, procs)
+            runs = [r for _ in procs for r in _get(results, procs)]
+        except BaseException:
+            for p in procs:
+                p.terminate()
+            raise
+        for p in procs:
+            p.join()
+        log(f"Built {len(runs)} sorted runs")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            level = 0
+            while len(runs) > MERGE_FANIN:
+                groups = [runs[i:i + MERGE_FANIN] for i in range(0, len(runs), MERGE_FANIN)]
+                futures = [pool.submit(_merge_to_run, g, os.path.join(work, f"m{level}_{j}.gz"))
+                           for j, g in enumerate(groups)]
+                runs = [f.result() for f in futures]
+                level += 1
+                log(f"Merge pass {level}: {len(runs)} runs left")
+        if out_path == "-":
+            n = merge_unique(runs, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        else:
+            with open(out_path, "wb") as out:
+                n = merge_unique(runs, out)
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="External parallel sort -u of one column.")
+    ap.add_argument("inputs", nargs="+", help="input files (.gz ok, - for stdin)")
+    ap.add_argument("-f", "--field", type=int, default=1, help="1-based column, as in cut -f")
+    ap.add_argument("-d", "--delimiter", default=";")
+    ap.add_argument("-o", "--output", default="-")
+    ap.add_argument("-m", "--memory-mb", type=int, default=DEFAULT_MEMORY_BUDGET >> 20)
+    ap.add_argument("-j", "--workers", type=int, default=None)
+    ap.add_argument("-T", "--tmpdir", default=None)
+    args = ap.parse_args()
+    n = sort_unique(args.inputs, args.output, field=args.field,
+                    delim=args.delimiter.encode("utf-8"),
+                    memory_budget=args.memory_mb << 20,
+                    workers=args.workers, tmpdir=args.tmpdir)
+    log(f"Wrote {n} unique keys to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Streaming hash join over `;`-separated WoC relations (SampleU files, lookup outputs).
+
+The smaller input is loaded into a hash table keyed on its join column and the
+larger one is streamed past it. When the table would exceed the memory budget
+both sides are hash-partitioned to temporary files and each partition pair is
+joined on its own (Grace hash join), recursing with a fresh hash salt if a
+partition is still too large.
+"""
+import gzip
+import hashlib
+import os
+import sys
+import tempfile
+
+DEFAULT_MEMORY_BUDGET = 1 << 30  # bytes
+ROW_OVERHEAD = 120  # rough per-row cost of a dict slot, list entry and str header
+MAX_DEPTH = 4
+GZIP_EXPANSION = 4  # uncompressed/compressed size assumed for .gz inputs
+
+
+def open_relation(path):
+    """Open a relation for text reading: `-` is stdin, `.gz` is decompressed."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="ignore")
+    return open(path, "r", errors="ignore")
+
+
+def iter_rows(path, key_field):
+    """Yield (key, line) for every row with a non-empty key column."""
+    f = open_relation(path)
+    try:
+        for line in f:
+            line = line.rstrip("\n")
+            parts = line.split(";", key_field + 1)
+            if len(parts) <= key_field or not parts[key_field]:
+                continue
+            yield parts[key_field], line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _partition_of(key, salt, partitions):
+    # keyed blake2b so each partitioning round splits independently of the last
+    digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=4,
+                             salt=salt.to_bytes(16, "little")).digest()
+    return int.from_bytes(digest, "little") % partitions
+
+
+def _build_table(rows, budget):
+    """Hash table of key -> [lines]; returns None if it would exceed the budget."""
+    table = {}
+    used = 0
+    for key, line in rows:
+        bucket = table.get(key)
+        if bucket is None:
+            table[key] = [line]
+            used += len(key) + ROW_OVERHEAD
+        else:
+            bucket.append(line)
+        used += len(line) + ROW_OVERHEAD // 2
+        if used > budget:
+            return None
+    return table
+
+
+def _spill(rows, paths, salt):
+    files = [open(p, "w") for p in paths]
+    try:
+        for key, line in rows:
+            files[_partition_of(key, salt, len(files))].write(f"{key}\t{line}\n")
+    finally:
+        for f in files:
+            f.close()
+
+
+def _read_spill(path):
+    with open(path, "r") as f:
+        for line in f:
+            key, row = line.rstrip("\n").split("\t", 1)
+            yield key, row
+
+
+def _probe(table, rows, build_is_left):
+    for key, line in rows:
+        matches = table.get(key)
+        if not matches:
+            continue
+        fields = line.split(";")
+        for other in matches:
+            if build_is_left:
+                yield key, other.split(";"), fields
+            else:
+                yield key, fields, other.split(";")
+
+
+def _join(build_rows, probe_rows, build_is_left, budget, tmpdir, depth, size_hint):
+    table = _build_table(build_rows(), budget)
+    if table is not None:
+        yield from _probe(table, probe_rows(), build_is_left)
+        return
+    if depth >= MAX_DEPTH:
+        raise MemoryError(f"hash join partition still exceeds {budget} bytes after "
+                          f"{depth} rounds of partitioning (heavily skewed key?)")
+    partitions = max(4, min(256, 2 * size_hint // max(1, budget) + 1))
+    with tempfile.TemporaryDirectory(prefix="woc_join_", dir=tmpdir) as work:
+        build_paths = [os.path.join(work, f"b{i}") for i in range(partitions)]
+        probe_paths = [os.path.join(work, f"p{i}") for i in range(partitions)]
+        salt = depth + 1
+        _spill(build_rows(), build_paths, salt)
+        _spill(probe_rows(), probe_paths, salt)
+        for bp, pp in zip(build_paths, probe_paths):
+            if os.path.getsize(bp) == 0 or os.path.getsize(pp) == 0:
+                continue
+            yield from _join(lambda bp=bp: _read_spill(bp),
+                             lambda pp=pp: _read_spill(pp),
+                             build_is_left, budget, work, depth + 1,
+                             os.path.getsize(bp))
+
+
+def _input_size(path):
+    """Estimated uncompressed size; gzip'd inputs expand several times once loaded."""
+    if path == "-":
+        return float("inf")
+    size = os.path.getsize(path)
+    return size * GZIP_EXPANSION if path.endswith(".gz") else size
+
+
+def hash_join(left_path, right_path, left_key=0, right_key=0,
+              memory_budget=DEFAULT_MEMORY_BUDGET, tmpdir=None):
+    """Inner-join two relations, yielding (key, left_fields, right_fields).
+
+    The smaller input (by estimated uncompressed size) is the build side;
+    stdin (`-`) is always streamed as the probe side.
+    """
+    left_size, right_size = _input_size(left_path), _input_size(right_path)
+    build_is_left = left_size <= right_size
+    if build_is_left:
+        build_path, build_key, probe_path, probe_key = left_path, left_key, right_path, right_key
+        size_hint = left_size
+    else:
+        build_path, build_key, probe_path, probe_key = right_path, right_key, left_path, left_key
+        size_hint = right_size
+    if build_path == "-":
+        raise ValueError("at most one side of a join can be read from stdin")
+    yield from _join(lambda: iter_rows(build_path, build_key),
+                     lambda: iter_rows(probe_path, probe_key),
+                     build_is_left, memory_budget, tmpdir, 0, int(size_hint))
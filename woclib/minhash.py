@@ -0,0 +1,164 @@
+"""Near-duplicate detection over tokenized blobs: MinHash signatures + LSH banding.
+
+A blob's tokens are turned into overlapping k-token shingles. Each token is
+hashed once with crc32, and a shingle hash mixes its k token hashes with
+odd multipliers, so shingling is a few vectorized passes. The signature
+keeps, for each of NUM_PERM seeded splitmix64 hash functions, the minimum
+over the shingles. Two blobs agree at one position with probability equal
+to the Jaccard similarity of their shingle sets.
+
+`LSHIndex` cuts signatures into `bands` bands of `rows` values. Blobs that
+share any band bucket are candidates. A candidate is accepted when the
+signature agreement reaches `threshold`, and accepted pairs are merged with
+union-find. Each blob is checked only against the first blob in each of its
+buckets, so indexing n blobs takes O(n * bands) time instead of comparing
+every pair. The first blob seen in a cluster represents it.
+"""
+import os
+import zlib
+
+import numpy as np
+
+from woclib.common import HOME, log
+
+NUM_PERM = 128
+BANDS = 16  # 16 bands x 8 rows: pairs near 0.7 Jaccard and up collide
+SHINGLE = 3
+THRESHOLD = 0.8
+CHUNK = 4096  # shingles hashed per pass, bounds the (NUM_PERM, CHUNK) work array
+
+_MULT = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                  0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD], dtype=np.uint64)
+
+
+def _mix(z):
+    """splitmix64 finalizer, elementwise on uint64 arrays (wrapping)."""
+    z = z ^ (z >> np.uint64(30))
+    z = z * np.uint64(0xBF58476D1CE4E5B9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def shingle_hashes(tokens, k=SHINGLE):
+    """Distinct 64-bit hashes of the k-token shingles (the whole list if shorter)."""
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    th = np.fromiter((zlib.crc32(t.encode("utf-8", "surrogatepass")) for t in tokens),
+                     dtype=np.uint64, count=len(tokens))
+    k = max(1, min(k, th.size, _MULT.size))
+    n = th.size - k + 1
+    h = np.zeros(n, dtype=np.uint64)
+    for i in range(k):
+        h = h + th[i:i + n] * _MULT[i]
+    return np.unique(h)
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, shingle=SHINGLE, seed=1):
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.seeds = np.random.default_rng(seed).integers(
+            0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+
+    def signature(self, tokens):
+        """uint32 signature of length num_perm, or None for an empty token list."""
+        sh = shingle_hashes(tokens, self.shingle)
+        if not sh.size:
+            return None
+        sig = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for i in range(0, sh.size, CHUNK):
+            np.minimum(sig, _mix(sh[None, i:i + CHUNK] ^ self.seeds[:, None]).min(axis=1), out=sig)
+        return (sig >> np.uint64(32)).astype(np.uint32)
+
+
+class LSHIndex:
+    """Streaming near-duplicate clustering of MinHash signatures."""
+
+    def __init__(self, bands=BANDS, threshold=THRESHOLD, hasher=None):
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self.threshold = threshold
+        self.keys = []
+        self._sigs = []
+        self._parent = []
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _find(self, i):
+        root = i
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[i] != root:
+            self._parent[i], i = root, self._parent[i]
+        return root
+
+    def _union(self, i, j):
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            # the earlier blob stays the representative
+            self._parent[max(ri, rj)] = min(ri, rj)
+
+    def add(self, key, sig):
+        """Index `sig` under `key`; returns the key of the representative of
+        the cluster it joined, or None if it matched no earlier blob."""
+        i = len(self.keys)
+        self.keys.append(key)
+        self._sigs.append(sig)
+        self._parent.append(i)
+        if sig is None:
+            return None
+        r = self.rows
+        for b, buckets in enumerate(self._buckets):
+            j = buckets.setdefault(sig[b * r:(b + 1) * r].tobytes(), i)
+            if j == i or self._find(j) == self._find(i):
+                continue
+            if np.count_nonzero(sig == self._sigs[j]) >= self.threshold * sig.size:
+                self._union(i, j)
+        root = self._find(i)
+        return self.keys[root] if root != i else None
+
+    def add_tokens(self, key, tokens):
+        return self.add(key, self.hasher.signature(tokens))
+
+    def clusters(self, min_size=2):
+        """{representative index: [member indices]} for clusters of at least min_size."""
+        groups = {}
+        for i in range(len(self.keys)):
+            groups.setdefault(self._find(i), []).append(i)
+        return {r: m for r, m in groups.items() if len(m) >= min_size}
+
+    def duplicate_keys(self):
+        """Keys of every blob that is not its cluster's representative."""
+        return {self.keys[i] for i in range(len(self.keys)) if self._find(i) != i}
+
+
+def write_cluster_report(index, label, stem, dropped=None):
+    """Near-duplicate clusters to ~/<stem>_clusters.tsv (one row per member);
+    returns summary counts for the caller's stats or summary file.
+
+    Callers that dedup while streaming pass the number of blobs they actually
+    skipped as `dropped`: a blob kept early can be merged into a cluster only
+    by a later one, so the final clusters over-count what was left out.
+    """
+    clusters = index.clusters()
+    outpath = os.path.join(HOME, f"{stem}_clusters.tsv")
+    with open(outpath, "w") as f:
+        f.write("representative\tsize\tmember\n")
+        for rep, members in sorted(clusters.items(), key=lambda kv: -len(kv[1])):
+            for m in members:
+                f.write(f"{index.keys[rep]}\t{len(members)}\t{index.keys[m]}\n")
+    dups = sum(len(m) - 1 for m in clusters.values()) if dropped is None else dropped
+    log(f"{label}: {len(clusters)} near-duplicate clusters, {dups} of {len(index)} blobs "
+        f"dropped (threshold {index.threshold}); written to {outpath}")
+    return {
+        "near_duplicate_threshold": index.threshold,
+        "near_duplicate_clusters": len(clusters),
+        "near_duplicate_blobs_dropped": dups,
+        "blobs_after_dedup": len(index) - dups,
+    }
@@ -0,0 +1,206 @@
+"""Persisted per-month aggregate state that new sample files can be folded into.
+
+Months are stored as integer offsets from 1970-01. Plain counts are kept per
+month; for distinct counts (e.g. unique blobs) each month also keeps a
+HyperLogLog register array so later shards can be merged without rereading
+earlier ones. Folded files are recorded by content, so a file is never
+counted twice; different files are all added up, so folds should come from
+disjoint shards (e.g. not two WoC versions of the same map, whose overlap
+would be double-counted).
+
+A state holds either sample-scale counts (uniform samples) or
+population-scale counts (stratum-weighted samples). Which one is recorded
+on the first fold, and `check_weighting` refuses files of the other kind.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+HLL_P = 12
+HLL_M = 1 << HLL_P
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_M)
+_REST_BITS = 64 - HLL_P
+_REST_MASK = np.uint64((1 << _REST_BITS) - 1)
+SOURCE_HASH_BYTES = 1 << 20  # bytes hashed at each end of a folded file
+
+
+def new_state(distinct=False):
+    return {
+        "counts": {},
+        "registers": {} if distinct else None,
+        "sources": set(),
+        "weighted": None,  # unknown until the first file is folded
+    }
+
+
+def load_state(path, distinct=False):
+    """Load a state file written by save_state, or start an empty one."""
+    state = new_state(distinct)
+    if not os.path.exists(path):
+        return state
+    with np.load(path, allow_pickle=False) as data:
+        for m, c in zip(data["months"].tolist(), data["counts"].tolist()):
+            state["counts"][m] = c
+        if distinct and "registers" in data.files:
+            for m, regs in zip(data["reg_months"].tolist(), data["registers"]):
+                state["registers"][m] = regs.copy()
+        state["sources"].update(data["sources"].tolist())
+        if "weighted" in data.files:
+            state["weighted"] = bool(data["weighted"])
+    return state
+
+
+def save_state(path, state):
+    months = np.array(sorted(state["counts"]), dtype=np.int64)
+    arrays = {
+        "months": months,
+        "counts": np.array([state["counts"][m] for m in months.tolist()], dtype=np.float64),
+        "sources": np.array(sorted(state["sources"]), dtype=str),
+    }
+    if state["weighted"] is not None:
+        arrays["weighted"] = np.array(state["weighted"])
+    if state["registers"] is not None:
+        reg_months = sorted(state["registers"])
+        arrays["reg_months"] = np.array(reg_months, dtype=np.int64)
+        arrays["registers"] = (np.stack([state["registers"][m] for m in reg_months])
+                               if reg_months else np.zeros((0, HLL_M), dtype=np.uint8))
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp, path)
+
+
+def source_key(path):
+    """Identify an input file by its size and a hash of its first and last
+    SOURCE_HASH_BYTES, so re-running skips it whatever it is called, while
+    same-named shards with different contents are still folded."""
+    size = os.path.getsize(path)
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read(SOURCE_HASH_BYTES))
+        if size > SOURCE_HASH_BYTES:
+            f.seek(max(SOURCE_HASH_BYTES, size - SOURCE_HASH_BYTES))
+            h.update(f.read())
+    return f"sha1:{h.hexdigest()}:{size}"
+
+
+def _legacy_source_key(path):
+    # states saved before content keys identified files by name and size
+    return f"{os.path.basename(path)}:{os.path.getsize(path)}"
+
+
+def check_weighting(state, weighted, path):
+    """Record whether `path` carries stratum weights; raises ValueError if the
+    state already holds counts of the other scale."""
+    if state["weighted"] is None:
+        state["weighted"] = bool(weighted)
+    elif state["weighted"] != bool(weighted):
+        held = "stratum-weighted (population-scale)" if state["weighted"] else "unweighted (sample-scale)"
+        raise ValueError(f"{path}: state holds {held} counts; the two kinds cannot share a state file")
+
+
+def already_folded(state, path):
+    return (source_key(path) in state["sources"] or
+            _legacy_source_key(path) in state["sources"])
+
+
+def mark_folded(state, path):
+    state["sources"].add(source_key(path))
+
+
+def months_of(timestamps):
+    ts = np.asarray(timestamps, dtype=np.int64)
+    return ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+
+
+def fold_timestamps(state, timestamps, weights=None):
+    """Add one (or weights[i]) to the month bucket of each timestamp."""
+    months = months_of(timestamps)
+    if months.size == 0:
+        return
+    uniq, inv = np.unique(months, return_inverse=True)
+    sums = np.bincount(inv, weights=weights, minlength=uniq.size)
+    counts = state["counts"]
+    for m, c in zip(uniq.tolist(), sums.tolist()):
+        counts[m] = counts.get(m, 0.0) + c
+
+
+def _key_hashes(keys):
+    hashes = np.empty(len(keys), dtype=np.uint64)
+    for i, k in enumerate(keys):
+        try:
+            hashes[i] = int(k[:16], 16)  # SHA1 hex is already uniformly distributed
+        except ValueError:
+            hashes[i] = int.from_bytes(
+                hashlib.blake2b(k.encode("utf-8"), digest_size=8).digest(), "big")
+    return hashes
+
+
+def fold_distinct(state, timestamps, keys, weights=None):
+    """Count each timestamp (weighted like fold_timestamps) and add its key to
+    that month's distinct sketch; the sketch itself is unweighted."""
+    fold_timestamps(state, timestamps, weights)
+    months = months_of(timestamps)
+    if months.size == 0:
+        return
+    hashes = _key_hashes(keys)
+    idx = (hashes >> np.uint64(_REST_BITS)).astype(np.intp)
+    rest = (hashes & _REST_MASK).astype(np.float64)
+    rho = (_REST_BITS + 1 - np.frexp(rest)[1]).astype(np.uint8)
+    registers = state["registers"]
+    for m in np.unique(months).tolist():
+        sel = months == m
+        regs = registers.get(m)
+        if regs is None:
+            regs = registers[m] = np.zeros(HLL_M, dtype=np.uint8)
+        np.maximum.at(regs, idx[sel], rho[sel])
+
+
+def hll_estimate(regs):
+    est = HLL_ALPHA * HLL_M * HLL_M / np.sum(np.ldexp(1.0, -regs.astype(np.int64)))
+    zeros = int(np.count_nonzero(regs == 0))
+    if est <= 2.5 * HLL_M and zeros:
+        est = HLL_M * np.log(HLL_M / zeros)
+    return float(est)
+
+
+def month_range(state, start_year=None, end_year=None):
+    """Every month between the first and last non-empty bucket, optionally clipped by year."""
+    if not state["counts"]:
+        return np.zeros(0, dtype=np.int64)
+    lo, hi = min(state["counts"]), max(state["counts"])
+    if start_year is not None:
+        lo = max(lo, (start_year - 1970) * 12)
+    if end_year is not None:
+        hi = min(hi, (end_year - 1970) * 12 + 11)
+    return np.arange(lo, hi + 1, dtype=np.int64)
+
+
+def monthly_counts(state, start_year=None, end_year=None):
+    """(months, counts) with empty months filled with zero."""
+    months = month_range(state, start_year, end_year)
+    counts = np.array([state["counts"].get(m, 0.0) for m in months.tolist()])
+    return months, counts
+
+
+def monthly_distinct(state, start_year=None, end_year=None):
+    """(months, per-month distinct estimates, cumulative distinct estimates)."""
+    months = month_range(state, start_year, end_year)
+    per_month = np.zeros(months.size)
+    cumulative = np.zeros(months.size)
+    running = np.zeros(HLL_M, dtype=np.uint8)
+    for i, m in enumerate(months.tolist()):
+        regs = state["registers"].get(m)
+        if regs is None:
+            cumulative[i] = cumulative[i - 1] if i else 0.0
+            continue
+        per_month[i] = hll_estimate(regs)
+        np.maximum(running, regs, out=running)
+        cumulative[i] = hll_estimate(running)
+    return months, per_month, cumulative
+
+
+def month_end_index(months):
+    """Month offsets to month-end datetime64 values, matching pandas' "ME" buckets."""
+    return (months + 1).astype("datetime64[M]").astype("datetime64[D]") - np.timedelta64(1, "D")
@@ -0,0 +1,101 @@
+"""Adaptive (sequential) sampling: grow a sample in randomized batches until
+the running confidence intervals are tight enough.
+
+After each batch the target statistics are re-estimated with a cheap
+bootstrap (a few hundred replicates). Precision is the CI half-width relative
+to the point estimate, and sampling can stop once every target is at or below
+the requested precision. Targets the bootstrap does not cover, such as a
+fitted exponent, are reported with `set_precision`.
+"""
+import math
+
+import numpy as np
+
+from woclib.bootstrap import bootstrap_ci
+from woclib.stratified import weighted_stats
+
+DEFAULT_PRECISION = 0.05
+DEFAULT_REPS = 200
+DEFAULT_MIN_N = 200
+
+
+def shuffled_batches(keys, batch_size, seed=None):
+    """Yield `keys` in batches of `batch_size`, in a random order."""
+    order = np.random.default_rng(seed).permutation(len(keys))
+    for i in range(0, len(order), batch_size):
+        yield [keys[j] for j in order[i:i + batch_size]]
+
+
+def relative_halfwidth(estimate, low, high):
+    half = (high - low) / 2
+    if estimate == 0:
+        return 0.0 if half == 0 else math.inf
+    return abs(half / estimate)
+
+
+class SequentialEstimator:
+    """Running relative precision of `targets` (names from woclib.bootstrap.STATS)."""
+
+    def __init__(self, targets=("mean", "median"), precision=DEFAULT_PRECISION, alpha=0.05,
+                 reps=DEFAULT_REPS, min_n=DEFAULT_MIN_N, seed=12345):
+        self.targets = tuple(targets)
+        self.target_precision = precision
+        self.alpha = alpha
+        self.reps = reps
+        self.min_n = min_n
+        self.seed = seed
+        self.batches = 0
+        self._values = []
+        self._weights = []
+        self._weighted = False
+        self._precision = {t: math.inf for t in self.targets}
+
+    @property
+    def n(self):
+        return len(self._values)
+
+    def add(self, values, weights=None):
+        """Append a batch and refresh the bootstrap precision of every target."""
+        values = list(values)
+        self._values.extend(values)
+        if weights is not None:
+            self._weighted = True
+            self._weights.extend(weights)
+        else:
+            self._weights.extend([1.0] * len(values))
+        self.batches += 1
+        if self.n < 2:
+            return
+        x = np.asarray(self._values, dtype=float)
+        w = np.asarray(self._weights, dtype=float) if self._weighted else None
+        point = weighted_stats(x, w if w is not None else np.ones_like(x))
+        cis = bootstrap_ci(x, reps=self.reps, alpha=self.alpha, seed=self.seed + self.batches,
+                           weights=w)
+        for t in self.targets:
+            if t in cis:
+                self._precision[t] = relative_halfwidth(point[t], *cis[t])
+
+    def set_precision(self, name, value):
+        """Report the relative precision of a target estimated elsewhere."""
+        self._precision[name] = value
+
+    def precision(self):
+        return dict(self._precision)
+
+    def converged(self):
+        return self.n >= self.min_n and all(
+            p <= self.target_precision for p in self._precision.values())
+
+    def summary(self):
+        """Lines for a stats file: target, achieved precision per statistic, sample size."""
+        out = {"precision_target": self.target_precision}
+        for name, p in self._precision.items():
+            out[f"{name}_rel_precision"] = p
+        out["sequential_converged"] = self.converged()
+        out["sequential_batches"] = self.batches
+        out["sequential_n"] = self.n
+        return out
+
+    def describe(self):
+        parts = ", ".join(f"{k}={v:.4f}" for k, v in self._precision.items())
+        return f"n={self.n}, relative precision: {parts}"
@@ -0,0 +1,377 @@
+"""Local query server that keeps loaded samples and derived arrays in memory.
+
+    python -m woclib serve --preload commits-per-author,projects-per-author
+    python -m woclib query stats commits-per-author
+    python -m woclib query hist blob-sizes --bins 30 --log
+    python -m woclib query topk projects-per-author -k 20
+    python -m woclib query overlap commits-per-project --key someone_repo
+    python -m woclib query topk url-domains -k 20
+
+The server listens on 127.0.0.1 (or a Unix socket with --socket) and
+answers GET requests with JSON. Each dataset is built the first time it is
+asked for, using the stage's own lookup functions in the stage's directory.
+The result stays in this process with the memoized loaders and shared SHA1
+stores from woclib.common, so later queries are answered from memory.
+`reload` drops everything so the next query re-reads the inputs.
+"""
+import http.client
+import json
+import os
+import signal
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from woclib import monthly_state
+from woclib.common import clear_cache, log, memoized, read_sampled_keys, shared_store, summary_stats
+
+HOST = "127.0.0.1"
+PORT = 8765
+DEFAULT_BINS = 20
+DEFAULT_K = 10
+
+
+class Dataset:
+    """One value per key (author, project, blob, month, domain), with optional sampling
+    weights and a lazily built overlap index."""
+
+    def __init__(self, keys, values, weights=None, overlap=None):
+        self.keys = list(keys)
+        self.values = np.asarray(values, dtype=float)
+        self.weights = weights
+        self._overlap = overlap
+        self._index = None
+
+    def overlap_index(self):
+        if self._overlap is None:
+            return None
+        if self._index is None:
+            self._index = self._overlap()
+        return self._index
+
+
+# ---------- dataset builders (run inside the stage's directory) ----------
+def _commits_per_author(mod):
+    from woclib.stratified import align_weights, read_key_weights
+    authors = read_sampled_keys("author_commits.tsv", mod.SAMPLE_STEP, "authors")
+    a2c = mod.lookup_commits_for_authors(authors, shared_store("commits"))
+    keys = [a for a, v in a2c.items() if len(v)]
+    weights = align_weights(read_key_weights(mod.AUTHOR_WEIGHTS_FILE), keys)
+    return Dataset(keys, [len(a2c[a]) for a in keys], weights)
+
+
+def _commits_per_project(mod):
+    from woclib.bitmaps import BitmapIndex
+    projects = read_sampled_keys("project_commits.tsv", mod.SAMPLE_STEP, "projects")
+    p2c = {p: v for p, v in mod.lookup_commits_for_projects(projects, shared_store("commits")).items()
+           if len(v)}
+
+    def overlap():
+        index = BitmapIndex()
+        for p, handles in p2c.items():
+            index.add(p, handles)
+        return index
+
+    return Dataset(p2c, [len(v) for v in p2c.values()], overlap=overlap)
+
+
+def _projects_per_author(mod):
+    from woclib.stratified import align_weights, read_key_weights
+    authors = read_sampled_keys("author_commits.tsv", mod.SAMPLE_STEP, "authors")
+    a2p = mod.lookup_projects_for_authors(authors)
+    weights = align_weights(read_key_weights(mod.AUTHOR_WEIGHTS_FILE), a2p.left_names)
+    return Dataset(a2p.left_names, a2p.left_degrees(), weights)
+
+
+def _authors_per_project(mod):
+    authors = read_sampled_keys("author_commits.tsv", mod.SAMPLE_STEP, "authors")
+    a2p = mod.lookup_projects_for_authors(authors)
+    return Dataset(a2p.right_names, a2p.right_degrees(),
+                   overlap=lambda: mod.shared_author_index(a2p))
+
+
+def _blob_sizes(mod):
+    with open(mod.BLOB_FILE, "r") as f:
+        blob_ids = [line.strip() for line in f if line.strip()]
+    pairs = list(mod.iter_blob_sizes(blob_ids))
+    return Dataset([b for b, _ in pairs], [s for _, s in pairs])
+
+
+def _month_keys(months):
+    return np.datetime_as_string(months.astype("datetime64[M]")).tolist()
+
+
+def _commits_per_month(mod):
+    # the saved state plus the default sample, folded in memory only
+    state = monthly_state.load_state(mod.STATE_FILE)
+    mod.fold_samples(state, [mod.SAMPLE_PATH])
+    months, counts = monthly_state.monthly_counts(state)
+    return Dataset(_month_keys(months), counts)
+
+
+def _blobs_per_month(mod):
+    state = monthly_state.load_state(mod.STATE_FILE, distinct=True)
+    if os.path.exists(mod.FIRST_SEEN_FILE) and not monthly_state.already_folded(state, mod.FIRST_SEEN_FILE):
+        blobs, timestamps = mod.read_first_seen(mod.FIRST_SEEN_FILE)
+        monthly_state.fold_distinct(state, timestamps, blobs)
+        monthly_state.mark_folded(state, mod.FIRST_SEEN_FILE)
+    months, per_month, _ = monthly_state.monthly_distinct(state)
+    return Dataset(_month_keys(months), per_month)
+
+
+@memoized
+def _token_state(mod, path):
+    store = shared_store("blobs")
+    handles = mod.load_blob_ids(path, store)
+    picked = np.random.default_rng().choice(handles, size=min(mod.SAMPLE_SIZE, len(handles)),
+                                            replace=False)
+    state = mod.new_token_state(per_blob=True)
+    mod.analyze_tokens(store.hex_many(picked), None, state)
+    return state
+
+
+def _tokens_per_blob(mod):
+    state = _token_state(mod, "blob_ids.txt")
+    return Dataset(state["blobs"], state["totals"])
+
+
+def _unique_tokens_per_blob(mod):
+    state = _token_state(mod, "blob_ids.txt")
+    return Dataset(state["blobs"], state["uniques"])
+
+
+@memoized
+def _url_counts(mod, path):
+    # the whole content file as one shard of the sharded traceability mode
+    return mod.map_content_shard((path, 0, os.path.getsize(path), os.devnull, frozenset()))
+
+
+def _url_domains(mod):
+    domains = _url_counts(mod, mod.BLOB_CONTENT_FILE)["domains"]
+    return Dataset(domains, list(domains.values()))
+
+
+def _foreign_urls_per_year(mod):
+    by_year = _url_counts(mod, mod.BLOB_CONTENT_FILE)["foreign_by_year"]
+    years = sorted(by_year)
+    return Dataset([str(y) for y in years], [by_year[y] for y in years])
+
+
+# dataset -> (stage whose script and directory it uses, builder)
+DATASETS = {
+    "commits-per-author": ("commits-per-author", _commits_per_author),
+    "commits-per-project": ("commits-per-project", _commits_per_project),
+    "projects-per-author": ("projects-per-author", _projects_per_author),
+    "authors-per-project": ("projects-per-author", _authors_per_project),
+    "blob-sizes": ("blob-sizes", _blob_sizes),
+    "commits-per-month": ("commits-over-time", _commits_per_month),
+    "blobs-per-month": ("blobs-over-time", _blobs_per_month),
+    "tokens-per-blob": ("tokens", _tokens_per_blob),
+    "unique-tokens-per-blob": ("tokens", _unique_tokens_per_blob),
+    "url-domains": ("traceability", _url_domains),
+    "foreign-urls-per-year": ("traceability", _foreign_urls_per_year),
+}
+
+
+class Catalog:
+    """Datasets built on first use and kept. Builds are serialized, since they
+    change the working directory; queries on built datasets are not."""
+
+    def __init__(self, workdir=None):
+        self._data = {}
+        self._lock = threading.Lock()
+        self.workdir = workdir  # None: each stage's own directory
+
+    def names(self):
+        return {name: name in self._data for name in DATASETS}
+
+    def get(self, name):
+        if name not in DATASETS:
+            raise KeyError(name)
+        ds = self._data.get(name)
+        if ds is None:
+            from woclib.cli import REPO_ROOT, STAGES, _in_dir, load_stage
+            with self._lock:
+                ds = self._data.get(name)
+                if ds is None:
+                    stage, build = DATASETS[name]
+                    mod = load_stage(stage)
+                    workdir = self.workdir or os.path.dirname(os.path.join(REPO_ROOT, STAGES[stage][0]))
+                    with _in_dir(workdir):
+                        ds = build(mod)
+                    self._data[name] = ds
+                    log(f"Loaded {name}: {len(ds.keys)} keys")
+        return ds
+
+    def reload(self):
+        with self._lock:
+            self._data.clear()
+            clear_cache()
+
+
+# ---------- queries ----------
+def _int(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+
+def q_stats(ds, params):
+    stats = summary_stats(ds.values, ds.weights, extremes=True)
+    reps = _int(params, "ci", 0)
+    if reps > 0 and ds.values.size:
+        from woclib.bootstrap import bootstrap_ci
+        stats["ci"] = bootstrap_ci(ds.values, reps=reps, weights=ds.weights)
+    stats["weighted"] = ds.weights is not None
+    return stats
+
+
+def q_hist(ds, params):
+    bins = _int(params, "bins", DEFAULT_BINS)
+    values = ds.values
+    if params.get("log") in ("1", "true", "yes"):
+        values = values[values > 0]
+        edges = (np.geomspace(values.min(), values.max(), bins + 1) if values.size
+                 else np.zeros(bins + 1))
+    else:
+        edges = bins
+    counts, edges = np.histogram(values, bins=edges)
+    return {"edges": edges, "counts": counts}
+
+
+def q_topk(ds, params):
+    k = _int(params, "k", DEFAULT_K)
+    order = np.argsort(-ds.values, kind="stable")[:k]
+    return {"top": [[ds.keys[i], ds.values[i]] for i in order.tolist()]}
+
+
+def q_overlap(ds, params):
+    index = ds.overlap_index()
+    if index is None:
+        raise ValueError("this dataset has no overlap index")
+    key = params.get("key")
+    if key is None:
+        raise ValueError("key is required")
+    return {"key": key, "top": index.top_k(key, _int(params, "k", DEFAULT_K))}
+
+
+QUERIES = {"stats": q_stats, "hist": q_hist, "topk": q_topk, "overlap": q_overlap}
+
+
+def _jsonable(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"not JSON serializable: {type(obj).__name__}")
+
+
+class Handler(BaseHTTPRequestHandler):
+    catalog = None  # set by make_server
+
+    def _reply(self, code, body):
+        data = json.dumps(body, default=_jsonable).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        cmd = url.path.strip("/")
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if cmd == "datasets":
+                return self._reply(200, self.catalog.names())
+            if cmd == "reload":
+                self.catalog.reload()
+                return self._reply(200, {"reloaded": True})
+            if cmd not in QUERIES:
+                return self._reply(404, {"error": f"unknown query {cmd!r}",
+                                         "queries": ["datasets", "reload", *QUERIES]})
+            name = params.get("dataset", "")
+            try:
+                ds = self.catalog.get(name)
+            except KeyError:
+                return self._reply(404, {"error": f"unknown dataset {name!r}",
+                                         "datasets": list(DATASETS)})
+            self._reply(200, QUERIES[cmd](ds, params))
+        except (ValueError, KeyError) as e:
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            log(f"Query {self.path} failed: {e!r}")
+            self._reply(500, {"error": repr(e)})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+
+    def log_message(self, fmt, *args):
+        log(f"{self.address_string()} {fmt % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(catalog, port=PORT, socket_path=None):
+    handler = type("CatalogHandler", (Handler,), {"catalog": catalog})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((HOST, port), handler)
+
+
+def serve(port=PORT, socket_path=None, preload=(), workdir=None):
+    catalog = Catalog(workdir)
+    for name in preload:
+        catalog.get(name)
+    server = make_server(catalog, port, socket_path)
+    log(f"Serving {', '.join(DATASETS)} on {socket_path or f'http://{HOST}:{port}'}")
+    signal.signal(signal.SIGTERM, signal.default_int_handler)  # clean up the socket on kill too
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ---------- client ----------
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def query(cmd, params=None, port=PORT, socket_path=None, timeout=None):
+    """Send one query; returns (HTTP status, decoded JSON body). A body that is
+    not JSON (e.g. an error page from the HTTP server itself) comes back as
+    text."""
+    conn = UnixHTTPConnection(socket_path, timeout) if socket_path else \
+        http.client.HTTPConnection(HOST, port, timeout=timeout)
+    try:
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        conn.request("GET", f"/{cmd}" + (f"?{urlencode(params)}" if params else ""))
+        resp = conn.getresponse()
+        text = resp.read().decode("utf-8", errors="replace")
+        try:
+            return resp.status, json.loads(text)
+        except ValueError:
+            return resp.status, text
+    finally:
+        conn.close()
@@ -0,0 +1,153 @@
+"""Compact store for SHA1 commit/blob identifiers.
+
+Each distinct SHA1 is kept once as 20 raw bytes in a NumPy array and is
+referred to by a dense integer handle (0..n-1). Lookups go through an
+open-addressing hash table held in a NumPy int32 array, probed in batches so
+interning a whole lookup reply costs a handful of vectorized passes rather
+than one dict operation per 40-character string.
+"""
+import re
+
+import numpy as np
+
+INITIAL_CAPACITY = 1 << 16
+MAX_LOAD = 0.5
+
+_SHA1_RE = re.compile(r"[0-9a-fA-F]{40}")
+
+
+def valid_mask(hexes):
+    """True where an id is a 40-character hex SHA1, the only form the store accepts."""
+    return np.fromiter((_SHA1_RE.fullmatch(h) is not None for h in hexes),
+                       dtype=bool, count=len(hexes))
+
+
+def _to_raw(hexes):
+    """Hex SHA1 strings -> (n, 20) uint8 array."""
+    if not len(hexes):
+        return np.zeros((0, 20), dtype=np.uint8)
+    raw = bytes.fromhex("".join(hexes))
+    if len(raw) != 20 * len(hexes):
+        raise ValueError("expected 40-character hex SHA1 ids")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 20)
+
+
+def _slot_hash(raw):
+    # SHA1 bytes are uniformly distributed, so the first 8 are a good hash
+    return np.ascontiguousarray(raw[:, :8]).view(np.uint64).ravel()
+
+
+class ShaStore:
+    """Interns hex SHA1s to integer handles and back."""
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._keys = np.zeros((capacity, 20), dtype=np.uint8)
+        self._size = 0
+        self._table = np.zeros(self._table_size_for(capacity), dtype=np.int32)
+
+    @staticmethod
+    def _table_size_for(n):
+        size = 1 << 10
+        while size * MAX_LOAD < n:
+            size <<= 1
+        return size
+
+    def __len__(self):
+        return self._size
+
+    def nbytes(self):
+        return self._keys[:self._size].nbytes + self._table.nbytes
+
+    def _grow(self, extra):
+        need = self._size + extra
+        if need > len(self._keys):
+            cap = len(self._keys)
+            while cap < need:
+                cap *= 2
+            keys = np.zeros((cap, 20), dtype=np.uint8)
+            keys[:self._size] = self._keys[:self._size]
+            self._keys = keys
+        if need > len(self._table) * MAX_LOAD:
+            self._table = np.zeros(self._table_size_for(need), dtype=np.int32)
+            if self._size:
+                self._probe(self._keys[:self._size], insert=False,
+                            preset=np.arange(self._size, dtype=np.int64))
+
+    def _probe(self, raw, insert, preset=None):
+        """Find (and optionally insert) every row of `raw`; -1 where absent.
+
+        Table slots hold handle + 1 (0 = empty). With `preset`, rows are
+        placed in the table under the given handles (used when rehashing).
+        """
+        mask = np.uint64(len(self._table) - 1)
+        slots = (_slot_hash(raw) & mask).astype(np.int64)
+        handles = np.full(len(raw), -1, dtype=np.int64)
+        pending = np.arange(len(raw))
+        while pending.size:
+            s = slots[pending]
+            t = self._table[s].astype(np.int64)
+            empty = t == 0
+            occupied = ~empty
+            if preset is None:
+                match = occupied.copy()
+                match[occupied] = (self._keys[t[occupied] - 1] == raw[pending[occupied]]).all(axis=1)
+            else:
+                match = np.zeros_like(occupied)
+            handles[pending[match]] = t[match] - 1
+            retry = pending[occupied & ~match]
+            slots[retry] = (slots[retry] + 1) & int(mask)
+            waiting = np.zeros(0, dtype=pending.dtype)
+            if insert or preset is not None:
+                e_idx = pending[empty]
+                e_slots = s[empty]
+                # several new ids may hash to the same free slot: the first one
+                # claims it, the rest look again next round
+                _, first = np.unique(e_slots, return_index=True)
+                claimers = e_idx[first]
+                if preset is None:
+                    # equal ids share a probe sequence, so claimers are distinct
+                    new = np.arange(self._size, self._size + len(claimers))
+                    self._keys[new] = raw[claimers]
+                    self._size += len(claimers)
+                else:
+                    new = preset[claimers]
+                self._table[slots[claimers]] = new + 1
+                handles[claimers] = new
+                waiting = np.setdiff1d(e_idx, claimers, assume_unique=True)
+            pending = np.concatenate([retry, waiting])
+        return handles
+
+    def intern_many(self, hexes):
+        """Handles for a batch of hex ids, adding unseen ones."""
+        raw = _to_raw(hexes)
+        self._grow(len(raw))
+        return self._probe(raw, insert=True)
+
+    def intern(self, hex_id):
+        return int(self.intern_many([hex_id])[0])
+
+    def lookup_many(self, hexes):
+        """Handles for a batch of hex ids, -1 for ids never interned."""
+        if not self._size:
+            return np.full(len(hexes), -1, dtype=np.int64)
+        return self._probe(_to_raw(hexes), insert=False)
+
+    def lookup(self, hex_id):
+        return int(self.lookup_many([hex_id])[0])
+
+    def hex_of(self, handle):
+        return self._keys[handle].tobytes().hex()
+
+    def hex_many(self, handles):
+        raw = self._keys[np.asarray(handles, dtype=np.int64)].tobytes().hex()
+        return [raw[i:i + 40] for i in range(0, len(raw), 40)]
+
+
+def group_handles(owner_idx, handles):
+    """Group parallel (owner index, handle) arrays into {owner index: handle array}."""
+    owner_idx = np.asarray(owner_idx, dtype=np.int64)
+    handles = np.asarray(handles, dtype=np.int64)
+    order = np.argsort(owner_idx, kind="stable")
+    owners, starts = np.unique(owner_idx[order], return_index=True)
+    parts = np.split(handles[order], starts[1:])
+    return dict(zip(owners.tolist(), parts))
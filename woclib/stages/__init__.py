@@ -0,0 +1,13 @@
+"""Namespace the analysis scripts are imported under by woclib.cli.
+
+The package path is the set of script directories, so a script such as
+sampling/traceability/analyze_traceabiliy.py is the importable module
+woclib.stages.analyze_traceabiliy. Functions a stage sends to a process pool
+are pickled by that module name, and worker processes can import it again,
+whatever the multiprocessing start method.
+"""
+import os
+
+from woclib.cli import REPO_ROOT, STAGES
+
+__path__ = sorted({os.path.dirname(os.path.join(REPO_ROOT, path)) for path, _ in STAGES.values()})
@@ -0,0 +1,283 @@
+"""Single-pass sampling of c2dat-style relations stratified by commit year.
+
+    zcat /da?_data/basemaps/gz/c2datFullU*.s | \
+        python -m woclib.stratified -t 2 --reservoir 20000 -o c2datStratU.s.gz
+
+keeps a fixed-size reservoir per year (or, with --rates, a Bernoulli sample
+at a per-year rate) so sparse early years are not swamped by recent ones.
+Alongside the sample it writes `<out>.weights.tsv` with each stratum's
+population, sample size and weight (population / sampled); the over-time
+and per-author analyses read those weights back to undo the oversampling.
+"""
+import argparse
+import gzip
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from woclib.common import log
+
+UNKNOWN = -1  # stratum for rows without a usable timestamp
+WEIGHTS_SUFFIX = ".weights.tsv"
+KEY_WEIGHTS_SUFFIX = ".key_weights.tsv"
+
+
+def year_of(ts):
+    try:
+        return time.gmtime(int(ts)).tm_year
+    except (ValueError, OverflowError, OSError):
+        return UNKNOWN
+
+
+def weights_path_for(sample_path):
+    """Weights file that belongs to a sample written by this module."""
+    return sample_path + WEIGHTS_SUFFIX
+
+
+class Reservoir:
+    """Fixed-size uniform sample of one stratum (Li's Algorithm L: random
+    numbers are drawn only when an item is actually taken)."""
+
+    def __init__(self, k, rng):
+        self.k = k
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self._w = 1.0
+        self._next = k
+
+    def _advance(self):
+        self._w *= math.exp(math.log(1.0 - self.rng.random()) / self.k)
+        gap = math.floor(math.log(1.0 - self.rng.random()) / math.log(1.0 - self._w)) if self._w < 1.0 else 0
+        self._next += gap + 1
+
+    def offer(self, item):
+        self.seen += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+            if len(self.items) == self.k:
+                self._next = self.k
+                self._advance()
+            return
+        if self.seen == self._next:
+            self.items[self.rng.randrange(self.k)] = item
+            self._advance()
+
+
+def read_rates(path):
+    rates = {}
+    with open(path, "r") as f:
+        for line in f:
+            parts = line.strip().replace("\t", ";").split(";")
+            if len(parts) >= 2 and not line.startswith("#"):
+                try:
+                    rates[int(parts[0])] = float(parts[1])
+                except ValueError:
+                    continue
+    return rates
+
+
+def stratified_sample(lines, ts_field, reservoir=None, rates=None, default_rate=0.001, seed=12345):
+    """Returns ({stratum: sampled lines}, {stratum: population count})."""
+    rng = random.Random(seed)
+    idx = ts_field - 1
+    population = {}
+    kept = {}
+    reservoirs = {}
+    for n, line in enumerate(lines, 1):
+        parts = line.split(";", idx + 1)
+        stratum = year_of(parts[idx]) if len(parts) > idx else UNKNOWN
+        population[stratum] = population.get(stratum, 0) + 1
+        if reservoir:
+            res = reservoirs.get(stratum)
+            if res is None:
+                res = reservoirs[stratum] = Reservoir(reservoir, rng)
+            res.offer(line)
+        elif rng.random() < rates.get(stratum, default_rate):
+            kept.setdefault(stratum, []).append(line)
+        if n % 100_000_000 == 0:
+            log(f"Processed {n} lines")
+    if reservoir:
+        kept = {s: r.items for s, r in reservoirs.items()}
+    return kept, population
+
+
+def write_weights(path, kept, population):
+    with open(path, "w") as f:
+        f.write("stratum\tpopulation\tsampled\tweight\n")
+        for stratum in sorted(population):
+            sampled = len(kept.get(stratum, ()))
+            weight = population[stratum] / sampled if sampled else 0.0
+            f.write(f"{stratum}\t{population[stratum]}\t{sampled}\t{weight}\n")
+
+
+def load_weights(path):
+    """{stratum (year): weight} from a weights file."""
+    weights = {}
+    with open(path, "r") as f:
+        next(f, None)
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) >= 4:
+                weights[int(parts[0])] = float(parts[3])
+    return weights
+
+
+def weights_for_timestamps(timestamps, weights, default=1.0):
+    """Per-row weights for an array of unix timestamps, looked up by year."""
+    years = np.asarray(timestamps, dtype=np.int64).astype("datetime64[s]").astype(
+        "datetime64[Y]").astype(np.int64) + 1970
+    out = np.full(years.shape, default, dtype=np.float64)
+    for year, w in weights.items():
+        out[years == year] = w
+    return out
+
+
+def load_key_weights(path):
+    """{key: weight} from a key weights file (key;weight per line)."""
+    weights = {}
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            key, sep, w = line.rstrip("\n").rpartition(";")
+            if sep:
+                try:
+                    weights[key] = float(w)
+                except ValueError:
+                    continue
+    return weights
+
+
+def read_key_weights(path):
+    """load_key_weights, or None when the file is missing or empty."""
+    if not os.path.exists(path):
+        return None
+    return load_key_weights(path) or None
+
+
+def align_weights(by_key, keys):
+    """Weights aligned with `keys`; keys missing from `by_key` get the mean weight."""
+    if by_key is None:
+        return None
+    default = float(np.mean(list(by_key.values())))
+    return np.array([by_key.get(k, default) for k in keys], dtype=float)
+
+
+def write_key_weights(path, kept, population, key_field):
+    """Mean stratum weight of each key's sampled rows (e.g. per author).
+
+    This is a row-weight approximation, not a key's inverse inclusion
+    probability. A key with n_s rows in stratum s is sampled with
+    probability 1 - prod_s (1 - p_s)^n_s. That needs every key's population
+    row counts per stratum, which a single pass over the input does not
+    keep. The row weights overstate the weight of keys with many rows.
+    """
+    idx = key_field - 1
+    sums, counts = {}, {}
+    for stratum, rows in kept.items():
+        w = population[stratum] / len(rows) if rows else 0.0
+        for line in rows:
+            parts = line.split(";", idx + 1)
+            if len(parts) <= idx:
+                continue
+            key = parts[idx].rstrip("\n")
+            sums[key] = sums.get(key, 0.0) + w
+            counts[key] = counts.get(key, 0) + 1
+    with open(path, "w") as f:
+        for key in sorted(sums):
+            f.write(f"{key};{sums[key] / counts[key]}\n")
+
+
+def weighted_stats(values, weights):
+    """Weighted counterparts of the count/mean/median/std/var/skew/kurtosis/quartile stats.
+
+    These use the bias-corrected definitions of the unweighted stats and of
+    the weighted bootstrap in woclib.bootstrap. Weights are rescaled to sum
+    to n. Central moments are taken under the weights and then given scipy's
+    bias=False corrections for n observations. Quartiles interpolate linearly
+    between ranks (n - 1) * q and the next rank, where each value covers its
+    share of ranks. With equal weights this is exactly np.percentile and
+    scipy's skew/kurtosis(bias=False).
+    """
+    from woclib.bootstrap import _moment_stats
+    x = np.asarray(values, dtype=float)
+    w = np.asarray(weights, dtype=float)
+    if x.size == 0 or w.sum() <= 0:
+        return {"count": 0, "mean": 0, "median": 0, "std": 0, "var": 0,
+                "skew": 0, "kurtosis": 0, "q1": 0, "q2": 0, "q3": 0}
+    n = x.size
+    nw = w * (n / w.sum())
+    shift = float(nw @ x) / n
+    d = x - shift
+    d2 = d * d
+    moments = _moment_stats(nw @ d, nw @ d2, nw @ (d2 * d), nw @ (d2 * d2), n, shift)
+    var = float(nw @ d2) / (n - 1) if n > 1 else 0.0
+    order = np.argsort(x, kind="stable")
+    xs = x[order]
+    cum = np.cumsum(nw[order])
+    def q(frac):
+        # value at fractional rank r is the first value whose ranks reach past r
+        h = (n - 1) * frac
+        lo = np.floor(h)
+        v0 = xs[min(int(np.searchsorted(cum, lo, side="right")), n - 1)]
+        v1 = xs[min(int(np.searchsorted(cum, min(lo + 1, n - 1), side="right")), n - 1)]
+        return float(v0 + (h - lo) * (v1 - v0))
+    return {
+        "count": int(n),
+        "weighted_count": float(w.sum()),
+        "mean": float(moments["mean"]),
+        "median": q(0.5),
+        "std": float(np.sqrt(var)),
+        "var": float(var),
+        "skew": float(moments["skew"]),
+        "kurtosis": float(moments["kurtosis"]),
+        "q1": q(0.25),
+        "q2": q(0.5),
+        "q3": q(0.75),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stratified-by-year single-pass sampler for c2dat-style relations.")
+    ap.add_argument("inputs", nargs="*", default=["-"], help="input files (.gz ok); stdin by default")
+    ap.add_argument("-o", "--output", required=True, help="sample output (.gz to compress)")
+    ap.add_argument("-t", "--ts-field", type=int, default=2, help="1-based timestamp column")
+    ap.add_argument("--reservoir", type=int, default=None, help="rows kept per year")
+    ap.add_argument("--rates", default=None, help="file of year;rate lines")
+    ap.add_argument("--default-rate", type=float, default=0.001)
+    ap.add_argument("--key-field", type=int, default=None,
+                    help="also write <output>.key_weights.tsv for this 1-based column (e.g. 4 = author): "
+                         "the mean row weight per key, an approximation of its inverse inclusion probability")
+    ap.add_argument("--seed", type=int, default=12345)
+    args = ap.parse_args()
+    if not args.reservoir and not args.rates:
+        ap.error("one of --reservoir or --rates is required")
+
+    def lines():
+        for path in args.inputs:
+            if path == "-":
+                yield from sys.stdin
+            else:
+                opener = gzip.open if path.endswith(".gz") else open
+                with opener(path, "rt", errors="ignore") as f:
+                    yield from f
+
+    rates = read_rates(args.rates) if args.rates else None
+    kept, population = stratified_sample(lines(), args.ts_field, args.reservoir, rates,
+                                         args.default_rate, args.seed)
+    opener = gzip.open if args.output.endswith(".gz") else open
+    with opener(args.output, "wt") as out:
+        for stratum in sorted(kept):
+            out.writelines(kept[stratum])
+    write_weights(weights_path_for(args.output), kept, population)
+    if args.key_field:
+        write_key_weights(args.output + KEY_WEIGHTS_SUFFIX, kept, population, args.key_field)
+    log(f"Kept {sum(len(v) for v in kept.values())} of {sum(population.values())} rows "
+        f"across {len(population)} strata -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Fixed-memory token frequency tracking: count-min sketch + space-saving top-k.
+
+Tokens are buffered in a small Counter and flushed in batches, so the sketch
+sees each distinct token once per flush. The sketch's estimate also gates
+which tokens may enter the top-k summary, so the long tail of rare tokens
+cannot churn it. Both structures only overestimate, so the reported frequency
+of a heavy hitter is the smaller of the two. Every piece is mergeable, so
+per-worker instances can be combined with `merge`.
+"""
+import hashlib
+import heapq
+import re
+from collections import Counter
+
+import numpy as np
+
+CMS_WIDTH = 1 << 20
+CMS_DEPTH = 4
+TOP_K = 10000
+FLUSH_DISTINCT = 200_000
+
+_TOKEN_SPLIT = re.compile(r"\W+")
+
+
+def tokenize(text):
+    """Word-character runs of `text`, in order."""
+    return [t for t in _TOKEN_SPLIT.split(text) if t]
+
+
+def _hash_pair(keys):
+    """Two independent 32-bit hashes per key, stable across processes."""
+    h = np.empty((len(keys), 2), dtype=np.uint64)
+    for i, k in enumerate(keys):
+        d = hashlib.blake2b(k.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+        h[i, 0] = int.from_bytes(d[:4], "little")
+        h[i, 1] = int.from_bytes(d[4:], "little") | 1
+    return h[:, 0], h[:, 1]
+
+
+class CountMinSketch:
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, keys):
+        h1, h2 = _hash_pair(keys)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) % np.uint64(self.width)).astype(np.intp)
+
+    def add_many(self, keys, counts):
+        if not keys:
+            return
+        cols = self._columns(keys)
+        counts = np.asarray(counts, dtype=np.int64)
+        for i in range(self.depth):
+            np.add.at(self.table[i], cols[i], counts)
+
+    def estimate_many(self, keys):
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        cols = self._columns(keys)
+        return self.table[np.arange(self.depth)[:, None], cols].min(axis=0)
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("count-min sketches must have the same shape to merge")
+        self.table += other.table
+
+
+class SpaceSaving:
+    """Space-saving summary of the k most frequent keys with per-key error bounds."""
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+        self._heap = []  # lazy (count, key) entries; stale ones are skipped
+
+    def _min_entry(self):
+        while True:
+            c, key = self._heap[0]
+            if self.counts.get(key) == c:
+                return c, key
+            heapq.heappop(self._heap)
+
+    def _push(self, key, count):
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(c, k) for k, c in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def add(self, key, count=1, upper_bound=None):
+        """Count `key`. `upper_bound` (e.g. a count-min estimate of the key's
+        running total) keeps keys that cannot outrank the current minimum
+        from evicting it, and caps the count a newcomer inherits."""
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+        elif len(counts) < self.k:
+            counts[key] = count
+            self.errors[key] = 0
+        else:
+            floor, victim = self._min_entry()
+            if upper_bound is not None and upper_bound <= floor:
+                return
+            heapq.heappop(self._heap)
+            del counts[victim]
+            del self.errors[victim]
+            start = floor + count if upper_bound is None else min(floor + count, upper_bound)
+            counts[key] = start
+            self.errors[key] = start - count
+        self._push(key, counts[key])
+
+    def min_count(self):
+        return self._min_entry()[0] if len(self.counts) >= self.k else 0
+
+    def merge(self, other):
+        """Keys missing from one summary are charged that summary's minimum."""
+        mine, theirs = self.min_count(), other.min_count()
+        merged, errors = {}, {}
+        for key in set(self.counts) | set(other.counts):
+            merged[key] = self.counts.get(key, mine) + other.counts.get(key, theirs)
+            errors[key] = (self.errors.get(key, mine) + other.errors.get(key, theirs))
+        top = heapq.nlargest(self.k, merged.items(), key=lambda kv: kv[1])
+        self.counts = dict(top)
+        self.errors = {key: errors[key] for key, _ in top}
+        self._heap = [(c, key) for key, c in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n=None):
+        """[(key, count, error)] by descending count."""
+        items = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)
+        return [(key, c, self.errors[key]) for key, c in items[:n]]
+
+
+class TokenFrequency:
+    """Bounded-memory corpus token frequencies fed straight from tokenize()."""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, k=TOP_K, flush_distinct=FLUSH_DISTINCT):
+        self.sketch = CountMinSketch(width, depth)
+        self.top_k = SpaceSaving(k)
+        self.total = 0
+        self.flush_distinct = flush_distinct
+        self._buffer = Counter()
+
+    def update(self, tokens):
+        self._buffer.update(tokens)
+        self.total += len(tokens)
+        if len(self._buffer) >= self.flush_distinct:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        # heaviest first, so light tokens are the ones that churn through the summary
+        items = self._buffer.most_common()
+        keys = [k for k, _ in items]
+        counts = [c for _, c in items]
+        self.sketch.add_many(keys, counts)
+        bounds = self.sketch.estimate_many(keys).tolist()
+        for key, c, bound in zip(keys, counts, bounds):
+            self.top_k.add(key, c, bound)
+        self._buffer.clear()
+
+    def merge(self, other):
+        self.flush()
+        other.flush()
+        self.sketch.merge(other.sketch)
+        self.top_k.merge(other.top_k)
+        self.total += other.total
+
+    def rank_table(self, n=None):
+        """[(rank, token, estimate, lower_bound)] for the heaviest tokens, re-ranked
+        by the tighter of the space-saving and count-min estimates."""
+        self.flush()
+        top = self.top_k.top()
+        if not top:
+            return []
+        cms = self.sketch.estimate_many([t for t, _, _ in top])
+        rows = [(t, min(c, int(e)), max(0, c - err)) for (t, c, err), e in zip(top, cms)]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return [(i + 1, t, est, low) for i, (t, est, low) in enumerate(rows[:n])]
+
+
+def fit_zipf(rank_rows, min_rank=1, min_count=1):
+    """Least-squares fit of log f = c - s log r; returns (s, c, r_squared, ranks used).
+
+    `min_count` drops the flat tail of tokens seen only a handful of times.
+    """
+    pts = [(r, f) for r, _, f, _ in rank_rows if r >= min_rank and f >= max(1, min_count)]
+    if len(pts) < 3:
+        return 0.0, 0.0, 0.0, len(pts)
+    r = np.log(np.array([p[0] for p in pts], dtype=float))
+    f = np.log(np.array([p[1] for p in pts], dtype=float))
+    slope, intercept = np.polyfit(r, f, 1)
+    resid = f - (slope * r + intercept)
+    ss_tot = float(np.sum((f - f.mean()) ** 2))
+    r2 = 1.0 - float(np.sum(resid ** 2)) / ss_tot if ss_tot > 0 else 0.0
+    return float(-slope), float(intercept), r2, len(pts)